@@ -10,6 +10,7 @@ import tud_rl.common.nets as nets
 from tud_rl.agents.base import BaseAgent
 from tud_rl.common.configparser import ConfigFile
 from tud_rl.common.exploration import Gaussian_Noise
+from tud_rl.common.target_update import polyak_update
 
 
 class DDPGAgent(BaseAgent):
@@ -32,7 +33,7 @@ class DDPGAgent(BaseAgent):
             raise NotImplementedError("Currently, image input is not supported for continuous action spaces.")
 
         # noise
-        self.noise = Gaussian_Noise(action_dim = self.num_actions)
+        self.noise = Gaussian_Noise(action_dim = self.num_actions, seed = self.seed, device = self.device)
 
         # replay buffer
         if self.mode == "train":
@@ -101,7 +102,7 @@ class DDPGAgent(BaseAgent):
        
         # exploration noise
         if self.mode == "train":
-            a += torch.tensor(self.noise.sample()).to(self.device)
+            a += self.noise.sample_tensor()
         
         # clip actions in [-1,1]
         return torch.clamp(a, -1, 1).cpu().numpy().reshape(self.num_actions)
@@ -215,8 +216,5 @@ class DDPGAgent(BaseAgent):
     @torch.no_grad()
     def polyak_update(self):
         """Soft update of target network weights."""
-        for target_p, main_p in zip(self.target_actor.parameters(), self.actor.parameters()):
-            target_p.data.copy_(self.tau * main_p.data + (1-self.tau) * target_p.data)
-        
-        for target_p, main_p in zip(self.target_critic.parameters(), self.critic.parameters()):
-            target_p.data.copy_(self.tau * main_p.data + (1-self.tau) * target_p.data)
+        polyak_update(self.target_actor, self.actor, self.tau)
+        polyak_update(self.target_critic, self.critic, self.tau)
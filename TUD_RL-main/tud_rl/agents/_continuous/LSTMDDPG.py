@@ -11,6 +11,7 @@ from tud_rl import logger
 from tud_rl.agents.base import BaseAgent
 from tud_rl.common.configparser import ConfigFile
 from tud_rl.common.exploration import Gaussian_Noise
+from tud_rl.common.target_update import polyak_update
 
 
 class LSTMDDPGAgent(BaseAgent):
@@ -39,7 +40,7 @@ class LSTMDDPGAgent(BaseAgent):
             logger.warning("The net structure cannot be controlled via the config-spec for LSTM-based agents.")
 
         # noise
-        self.noise = Gaussian_Noise(action_dim = self.num_actions)
+        self.noise = Gaussian_Noise(action_dim = self.num_actions, seed = self.seed, device = self.device)
 
         # replay buffer
         if self.mode == "train":
@@ -120,7 +121,7 @@ class LSTMDDPGAgent(BaseAgent):
         
         # add noise
         if self.mode == "train":
-            a += torch.tensor(self.noise.sample()).to(self.device)
+            a += self.noise.sample_tensor()
         
         # clip actions in [-1,1]
         return torch.clamp(a, -1, 1).cpu().numpy().reshape(self.num_actions)
@@ -225,8 +226,5 @@ class LSTMDDPGAgent(BaseAgent):
     @torch.no_grad()
     def polyak_update(self):
         """Soft update of target network weights."""
-        for target_p, main_p in zip(self.target_actor.parameters(), self.actor.parameters()):
-            target_p.data.copy_(self.tau * main_p.data + (1-self.tau) * target_p.data)
-        
-        for target_p, main_p in zip(self.target_critic.parameters(), self.critic.parameters()):
-            target_p.data.copy_(self.tau * main_p.data + (1-self.tau) * target_p.data)
+        polyak_update(self.target_actor, self.actor, self.tau)
+        polyak_update(self.target_critic, self.critic, self.tau)
@@ -10,6 +10,7 @@ import tud_rl.common.nets as nets
 from tud_rl import logger
 from tud_rl.agents.base import BaseAgent
 from tud_rl.common.configparser import ConfigFile
+from tud_rl.common.target_update import polyak_update
 
 
 class LSTMSACAgent(BaseAgent):
@@ -251,5 +252,4 @@ class LSTMSACAgent(BaseAgent):
     def polyak_update(self):
         """Soft update of target network weights."""
 
-        for target_p, main_p in zip(self.target_critic.parameters(), self.critic.parameters()):
-            target_p.data.copy_(self.tau * main_p.data + (1-self.tau) * target_p.data)
+        polyak_update(self.target_critic, self.critic, self.tau)
@@ -12,6 +12,7 @@ import tud_rl.common.nets as nets
 from tud_rl.agents.base import BaseAgent
 from tud_rl.common.configparser import ConfigFile
 from tud_rl.common.exploration import Gaussian_Noise
+from tud_rl.common.target_update import polyak_update
 
 
 class MADDPGAgent(BaseAgent):
@@ -37,7 +38,8 @@ class MADDPGAgent(BaseAgent):
             raise NotImplementedError("Currently, image input is not supported for MADDPG.")
 
         # noise
-        self.noise = Gaussian_Noise(action_dim = self.num_actions)
+        # one noise row per agent
+        self.noise = Gaussian_Noise(action_dim = self.num_actions, num_envs = self.N_agents, seed = self.seed, device = self.device)
 
         # replay buffer
         if self.mode == "train":
@@ -109,8 +111,7 @@ class MADDPGAgent(BaseAgent):
        
         # exploration noise
         if self.mode == "train":
-            for i in range(self.N_agents):
-                a[i] += torch.tensor(self.noise.sample().flatten()).to(self.device)
+            a += self.noise.sample_tensor()
         
         # clip actions in [-1,1]
         return torch.clamp(a, -1, 1).cpu().numpy()
@@ -310,8 +311,5 @@ class MADDPGAgent(BaseAgent):
     @torch.no_grad()
     def polyak_update(self):
         """Soft update of target network weights."""
-        for target_p, main_p in zip(self.target_actor.parameters(), self.actor.parameters()):
-            target_p.data.copy_(self.tau * main_p.data + (1-self.tau) * target_p.data)
-        
-        for target_p, main_p in zip(self.target_critic.parameters(), self.critic.parameters()):
-            target_p.data.copy_(self.tau * main_p.data + (1-self.tau) * target_p.data)
+        polyak_update(self.target_actor, self.actor, self.tau)
+        polyak_update(self.target_critic, self.critic, self.tau)
@@ -5,6 +5,7 @@ from tud_rl.agents._discrete.KEBootDQN import KEBootDQNAgent
 from tud_rl.common.configparser import ConfigFile
 from tud_rl.common.helper_fnc import get_MC_ret_from_rew
 from tud_rl.common.logging_func import *
+from tud_rl.common.target_update import hard_update
 
 
 class AdaKEBootDQNAgent(KEBootDQNAgent):
@@ -58,7 +59,7 @@ class AdaKEBootDQNAgent(KEBootDQNAgent):
         if self.tgt_up_cnt % self.tgt_update_freq == 0:
 
             # target
-            self.target_DQN.load_state_dict(self.DQN.state_dict())
+            hard_update(self.target_DQN, self.DQN)
 
             # get delta's between Q and MC rollouts
             delta = 0.0
@@ -11,6 +11,7 @@ import tud_rl.common.nets as nets
 from tud_rl.agents.base import BaseAgent
 from tud_rl.common.configparser import ConfigFile
 from tud_rl.common.exploration import LinearDecayEpsilonGreedy
+from tud_rl.common.target_update import hard_update
 
 
 class DQNAgent(BaseAgent):
@@ -194,4 +195,4 @@ class DQNAgent(BaseAgent):
         self.tgt_up_cnt += 1
 
         if self.tgt_up_cnt % self.tgt_update_freq == 0:
-            self.target_DQN.load_state_dict(self.DQN.state_dict())
+            hard_update(self.target_DQN, self.DQN)
@@ -9,6 +9,7 @@ import tud_rl.common.nets as nets
 from tud_rl.agents._discrete.DQN import DQNAgent
 from tud_rl.common.configparser import ConfigFile
 from tud_rl.common.logging_func import *
+from tud_rl.common.target_update import hard_update
 
 
 class EnsembleDQNAgent(DQNAgent):
@@ -156,7 +157,7 @@ class EnsembleDQNAgent(DQNAgent):
 
     def _target_update(self):
         if self.tgt_up_cnt % self.tgt_update_freq == 0:
-            self.target_DQN.load_state_dict(self.DQN.state_dict())
+            hard_update(self.target_DQN, self.DQN)
 
         # increase target-update cnt
         self.tgt_up_cnt += 1
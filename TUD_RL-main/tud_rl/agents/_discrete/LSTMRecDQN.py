@@ -12,6 +12,7 @@ from tud_rl import logger
 from tud_rl.agents.base import BaseAgent
 from tud_rl.common.configparser import ConfigFile
 from tud_rl.common.exploration import LinearDecayEpsilonGreedy
+from tud_rl.common.target_update import hard_update
 
 
 class LSTMRecDQNAgent(BaseAgent):
@@ -209,4 +210,4 @@ class LSTMRecDQNAgent(BaseAgent):
         self.tgt_up_cnt += 1
 
         if self.tgt_up_cnt % self.tgt_update_freq == 0:
-            self.target_DQN.load_state_dict(self.DQN.state_dict())
+            hard_update(self.target_DQN, self.DQN)
@@ -1,3 +1,5 @@
+import copy
+
 import numpy as np
 import torch
 
@@ -39,6 +41,23 @@ class UniformReplayBuffer:
 
         self.ptr  = (self.ptr + 1) % self.max_size
         self.size = min(self.size + 1, self.max_size)
+
+    def snapshot(self):
+        """Returns a copy that holds only the filled rows of the arrays, e.g. for writing a checkpoint
+        while training goes on. Unpickling it restores arrays of length max_size."""
+        snap = copy.copy(self)
+        for key, value in vars(self).items():
+            if isinstance(value, np.ndarray) and len(value) == self.max_size:
+                setattr(snap, key, value[:self.size].copy())
+        return snap
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        for key, value in state.items():
+            if isinstance(value, np.ndarray) and value.ndim and len(value) == self.size < self.max_size:
+                full = np.zeros((self.max_size, *value.shape[1:]), dtype=value.dtype)
+                full[:self.size] = value
+                setattr(self, key, full)
     
     def sample(self):
         """Return sizes:
@@ -0,0 +1,132 @@
+import collections
+import io
+import os
+import pickle
+import queue
+import threading
+import uuid
+
+import torch
+
+# Only torch and the standard library are imported here: agents/DDPG of the SUMO project loads
+# this file directly (importing the tud_rl package needs gym) instead of keeping its own copy.
+
+
+def atomic_write(data: bytes, path: str) -> None:
+    """Writes data to a temporary file next to path and renames it into place, so readers
+    never see a partially written file. Missing directories are created."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def atomic_save(obj, path: str) -> None:
+    """torch.save through atomic_write."""
+    buffer = io.BytesIO()
+    torch.save(obj, buffer)
+    atomic_write(buffer.getvalue(), path)
+
+
+class CheckpointWriter:
+    """Writes checkpoints on a background thread.
+
+    save() takes a CPU copy of the state dict and returns; serialization and file writes happen
+    on the writer thread, each file via a temporary file and an atomic rename. Next to the
+    latest file, the keep most recent checkpoints per file are kept as <stem>_<step><ext>, and a
+    best file is written on request. Filenames are relative to directory unless absolute.
+
+    At most max_pending jobs wait for the writer, beyond that save() waits, so a slow disk
+    cannot pile up snapshots in memory; is_pending() lets callers skip a large object instead.
+    Errors of the writer thread are raised by the next save(), flush() or close()."""
+    def __init__(self, directory=".", keep=3, max_pending=8):
+        self.directory = directory
+        self.keep      = keep
+        self.history   = collections.defaultdict(collections.deque)
+        self.error     = None
+
+        self.pending = collections.Counter()
+        self.lock    = threading.Lock()
+        self.jobs    = queue.Queue(maxsize=max_pending)
+        self.thread  = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def save(self, state_dict, filename, step=None, best_filename=None) -> None:
+        """Queues state_dict for writing to filename, to <stem>_<step><ext> if step is given and
+        to best_filename if given."""
+        snapshot = {k: v.detach().to("cpu", copy=True) if torch.is_tensor(v) else v for k, v in state_dict.items()}
+        self._put((torch.save, snapshot, filename, step, best_filename))
+
+    def save_object(self, obj, filename) -> None:
+        """Queues pickling obj to filename. obj must not change afterwards, so pass a copy."""
+        self._put((pickle.dump, obj, filename, None, None))
+
+    def is_pending(self, filename) -> bool:
+        """Whether a job for filename is still queued or being written."""
+        with self.lock:
+            return self.pending[filename] > 0
+
+    def flush(self) -> None:
+        """Blocks until every queued checkpoint is written."""
+        self.jobs.join()
+        self._raise()
+
+    def close(self) -> None:
+        self.jobs.put(None)
+        self.thread.join()
+        self._raise()
+
+    def _put(self, job):
+        self._raise()
+        with self.lock:
+            self.pending[job[2]] += 1
+        self.jobs.put(job)
+
+    def _raise(self):
+        if self.error is not None:
+            raise RuntimeError("writing checkpoint failed") from self.error
+
+    def _run(self):
+        while True:
+            job = self.jobs.get()
+            try:
+                if job is None:
+                    return
+                self._write(*job)
+            except Exception as e:
+                self.error = e
+            finally:
+                if job is not None:
+                    with self.lock:
+                        self.pending[job[2]] -= 1
+                self.jobs.task_done()
+
+    def _write(self, dump, obj, filename, step, best_filename):
+        buffer = io.BytesIO()
+        dump(obj, buffer)
+        data = buffer.getvalue()
+
+        path = os.path.join(self.directory, filename)
+        atomic_write(data, path)
+        if best_filename is not None:
+            atomic_write(data, os.path.join(self.directory, best_filename))
+
+        if step is not None:
+            stem, ext = os.path.splitext(path)
+            step_path = f"{stem}_{step}{ext}"
+            atomic_write(data, step_path)
+
+            # keep the most recent ones
+            history = self.history[path]
+            history.append(step_path)
+            while len(history) > self.keep:
+                old = history.popleft()
+                if os.path.exists(old):
+                    os.remove(old)
@@ -1,5 +1,8 @@
 import copy
+import math
+
 import numpy as np
+import torch
 
 
 class LinearDecayEpsilonGreedy:
@@ -24,38 +27,74 @@ class LinearDecayEpsilonGreedy:
         return self.current_eps
 
 
+class _NormalBlocks:
+    """Standard normal draws of a fixed shape, generated block_size at a time from a seeded Generator."""
+    def __init__(self, shape, block_size=1024, seed=None):
+        self.shape      = shape
+        self.block_size = block_size
+        self.rng        = np.random.default_rng(seed)
+        self.idx        = block_size
+
+    def next(self):
+        if self.idx == self.block_size:
+            self.block = self.rng.standard_normal(size=(self.block_size, *self.shape), dtype=np.float32)
+            self.idx   = 0
+        self.idx += 1
+        return self.block[self.idx - 1]
+
+
 class OU_Noise:
-    """Create Ornstein-Uhlenbeck process for exploration."""
-    def __init__(self, action_dim, mu=0.0, theta=0.15, dt=0.01, sigma=0.1):
+    """Create Ornstein-Uhlenbeck process for exploration, one independent process per env (or agent)."""
+    def __init__(self, action_dim, mu=0.0, theta=0.15, dt=0.01, sigma=0.1, num_envs=1, seed=None, block_size=1024, device="cpu"):
         self.action_dim   = action_dim
+        self.num_envs     = num_envs
         
-        self.mu    = np.ones(shape=(1,action_dim)) * mu
+        self.mu    = np.ones(shape=(num_envs,action_dim), dtype=np.float32) * mu
         self.theta = theta
         self.dt    = dt
         self.sigma = sigma
+        self.device = device
+        self.normal = _NormalBlocks((num_envs, action_dim), block_size, seed)
         self.reset()
         
-    def reset(self):
-        self.x = copy.deepcopy(self.mu)
+    def reset(self, mask=None):
+        """Resets all processes, or only those of the envs where the boolean mask of shape (num_envs,) is True."""
+        if mask is None:
+            self.x = copy.deepcopy(self.mu)
+        else:
+            self.x[mask] = self.mu[mask]
             
     def sample(self):
         """Samples from process.
-        returns: np.array with shape (1, action_dim)."""
-        dx = self.theta * (self.mu - self.x) * self.dt + self.sigma * np.sqrt(self.dt) * np.random.randn(1,self.action_dim)
+        returns: np.array with shape (num_envs, action_dim)."""
+        dx = self.theta * (self.mu - self.x) * self.dt + self.sigma * math.sqrt(self.dt) * self.normal.next()
         self.x += dx
-        return self.x
+        return self.x.copy()
+
+    def sample_tensor(self):
+        """Samples from process.
+        returns: torch.Tensor with shape (num_envs, action_dim) on the device."""
+        return torch.from_numpy(self.sample()).to(self.device)
 
 
 class Gaussian_Noise:
-    """Create white noise process for exploration."""
-    def __init__(self, action_dim, mu=0.0, sigma=0.1):
+    """Create white noise process for exploration, one row per env (or agent)."""
+    def __init__(self, action_dim, mu=0.0, sigma=0.1, num_envs=1, seed=None, block_size=1024, device="cpu"):
         self.action_dim = action_dim
+        self.num_envs   = num_envs
         
-        self.mu    = np.ones(shape=(1,action_dim)) * mu
-        self.sigma = sigma
+        self.mu     = np.ones(shape=(num_envs,action_dim), dtype=np.float32) * mu
+        self.sigma  = sigma
+        self.device = device
+        self.normal = _NormalBlocks((num_envs, action_dim), block_size, seed)
 
     def sample(self):
-        return self.mu + self.sigma * np.random.randn(1,self.action_dim)
+        """returns: np.array with shape (num_envs, action_dim)."""
+        return self.mu + self.sigma * self.normal.next()
+
+    def sample_tensor(self):
+        """returns: torch.Tensor with shape (num_envs, action_dim) on the device."""
+        return torch.from_numpy(self.sample()).to(self.device)
     
-    def reset(self):
+    def reset(self, mask=None):
         pass
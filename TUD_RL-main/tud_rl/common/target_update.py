@@ -0,0 +1,21 @@
+import torch
+import torch.nn as nn
+
+# Only torch is imported here: agents/DDPG of the SUMO project loads this file directly (importing
+# the tud_rl package needs gym) instead of keeping its own copy.
+
+
+@torch.no_grad()
+def polyak_update(target_net: nn.Module, net: nn.Module, tau: float) -> None:
+    """Soft update of target network weights, target <- tau * net + (1 - tau) * target.
+    Runs in place as a single fused op over all parameters, without temporaries."""
+    torch._foreach_lerp_(list(target_net.parameters()), list(net.parameters()), tau)
+
+
+@torch.no_grad()
+def hard_update(target_net: nn.Module, net: nn.Module) -> None:
+    """Copies parameters and buffers of net into target_net in place. Same result as
+    target_net.load_state_dict(net.state_dict()), without building the state dict."""
+    targets = list(target_net.parameters()) + list(target_net.buffers())
+    sources = list(net.parameters()) + list(net.buffers())
+    torch._foreach_copy_(targets, sources)
@@ -12,6 +12,7 @@ import torch
 import tud_rl.agents.continuous as agents
 from tud_rl import logger
 from tud_rl.agents.base import _Agent
+from tud_rl.common.checkpoint import CheckpointWriter
 from tud_rl.common.configparser import ConfigFile
 from tud_rl.common.logging_func import EpochLogger
 from tud_rl.common.logging_plot import plot_from_progress
@@ -145,6 +146,9 @@ def train(c: ConfigFile, agent_name: str):
     agent.logger.save_config({"agent_name": agent.name, **c.config_dict})
     agent.print_params(agent.n_params, case=1)
 
+    # weights and buffer are written in the background, keeping the last 3 epochs
+    checkpoints = CheckpointWriter(agent.logger.output_dir, keep=3)
+
     # save env-file for traceability
     try:
         entry_point = vars(gym.envs.registry[c.Env.name])["entry_point"][12:]
@@ -295,10 +299,12 @@ def train(c: ConfigFile, agent_name: str):
                                env_str = c.Env.name,
                                info    = c.Env.info)
             # save weights
-            save_weights(agent, eval_ret)
+            save_weights(agent, eval_ret, checkpoints, total_steps)
+
+    checkpoints.close()
 
 
-def save_weights(agent: _Agent, eval_ret) -> None:
+def save_weights(agent: _Agent, eval_ret, checkpoints: CheckpointWriter, step: int) -> None:
 
     # check whether this was the best evaluation epoch so far
     with open(f"{agent.logger.output_dir}/progress.txt") as f:
@@ -321,15 +327,13 @@ def save_weights(agent: _Agent, eval_ret) -> None:
         else:
             best_weights = False
 
-    # usual save
-    torch.save(agent.actor.state_dict(), f"{agent.logger.output_dir}/{agent.name}_actor_weights.pth")
-    torch.save(agent.critic.state_dict(), f"{agent.logger.output_dir}/{agent.name}_critic_weights.pth")
-
-    # best save
-    if best_weights:
-        torch.save(agent.actor.state_dict(), f"{agent.logger.output_dir}/{agent.name}_actor_best_weights.pth")
-        torch.save(agent.critic.state_dict(), f"{agent.logger.output_dir}/{agent.name}_critic_best_weights.pth")
+    # usual save, plus best save
+    actor_best  = f"{agent.name}_actor_best_weights.pth" if best_weights else None
+    critic_best = f"{agent.name}_critic_best_weights.pth" if best_weights else None
+    checkpoints.save(agent.actor.state_dict(), f"{agent.name}_actor_weights.pth", step, actor_best)
+    checkpoints.save(agent.critic.state_dict(), f"{agent.name}_critic_weights.pth", step, critic_best)
 
-    # stores the replay buffer
-    with open(f"{agent.logger.output_dir}/buffer.pickle", "wb") as handle:
-        pickle.dump(agent.replay_buffer, handle)
+    # stores a copy of the filled part of the replay buffer, training goes on filling the original;
+    # skipped while the previous one is still being written
+    if not checkpoints.is_pending("buffer.pickle"):
+        checkpoints.save_object(agent.replay_buffer.snapshot(), "buffer.pickle")
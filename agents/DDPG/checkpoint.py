@@ -0,0 +1,11 @@
+'''
+The checkpoint writer is shared with TUD_RL, see
+TUD_RL-main/tud_rl/common/checkpoint.py.
+'''
+from tud_rl_common import load
+
+_checkpoint = load('checkpoint')
+
+atomic_write = _checkpoint.atomic_write
+atomic_save = _checkpoint.atomic_save
+CheckpointWriter = _checkpoint.CheckpointWriter
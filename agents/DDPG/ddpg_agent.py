@@ -5,38 +5,80 @@ import torch.nn.functional as F
 from networks import ActorNetwork, CriticNetwork
 from noise import OUActionNoise
 from replay_buffer import ReplayBuffer
+from checkpoint import CheckpointWriter
+from tud_rl_common import load
+
+# the soft and hard target updates of TUD_RL
+target_update = load('target_update')
 
 class Agent():
-    def __init__(self, alpha, beta, input_dims, tau, n_actions, gamma=0.99, max_size=1000000, fc1_dims=400, fc2_dims=300, batch_size=64):
+    def __init__(self, alpha, beta, input_dims, tau, n_actions, gamma=0.99, max_size=1000000, fc1_dims=400, fc2_dims=300, batch_size=64,
+                 num_envs=1, action_low=-1.0, action_high=1.0, seed=None, keep_checkpoints=3):
         self.gamma = gamma
         self.tau = tau
         self.batch_size = batch_size
         self.alpha = alpha
         self.beta = beta
         self.memory = ReplayBuffer(max_size, input_dims, n_actions)
-        self.noise = OUActionNoise(mu=np.zeros(n_actions))
+        self.num_envs = num_envs
+        # the actor acts in [-1, 1], the env in [action_low, action_high],
+        # e.g. env.action_space.low and .high; the buffer keeps the former
+        self.action_low = np.asarray(action_low, dtype=np.float32)
+        self.action_high = np.asarray(action_high, dtype=np.float32)
+        self.keep_checkpoints = keep_checkpoints
+        self.checkpoints = None
         self.actor = ActorNetwork(alpha, input_dims, fc1_dims, fc2_dims, n_actions, name='actor')
         self.critic = CriticNetwork(beta, input_dims, fc1_dims, fc2_dims, n_actions, name='critic')
         self.target_actor = ActorNetwork(alpha, input_dims, fc1_dims, fc2_dims, n_actions, name='target_actor')
         self.target_critic = CriticNetwork(beta, input_dims, fc1_dims, fc2_dims, n_actions, name='target_critic') 
-        self.update_network(tau=1)
+        # one independent noise trajectory per environment of a vector env
+        self.noise = OUActionNoise(mu=np.zeros((num_envs, n_actions)), seed=seed, device=self.actor.device)
+        self.update_network_parameters(tau=1)
 
     def choose_action(self, observation):
-        self.actor.eval()
-        state = T.tensor([observation], dtype=float).to(self.actor.device)
-        mu = self.actor(state).to(self.actor.device) # get action mu
-        mu_prime = mu + T.tensor(self.noise(), dtype=float).to(self.actor.device) # add noise to action space
-        self.actor.train() 
-        return mu_prime.cpu().detatch().numpy()[0]
+        '''
+        observation is a single (obs_dim,) array or a batch (num_envs, obs_dim)
+        from a vector env; one forward pass for the whole batch, returns the
+        noisy actions rescaled to the action bounds, (n_actions,) or
+        (num_envs, n_actions)
+        '''
+        observation = np.asarray(observation, dtype=np.float32)
+        single = observation.ndim == 1
+        states = observation.reshape(-1, observation.shape[-1])
+        if states.shape[0] != self.num_envs:
+            raise ValueError(f"expected observations of {self.num_envs} envs, got {states.shape[0]}")
+
+        # the actor normalises with LayerNorm, so train and eval mode agree
+        with T.no_grad():
+            mu = self.actor(T.from_numpy(states).to(self.actor.device))
+            actions = T.clamp(mu + self.noise.sample_tensor(), -1.0, 1.0)
+        actions = self.action_low + (actions.cpu().numpy() + 1.0) * 0.5 * (self.action_high - self.action_low)
+        return actions[0] if single else actions
     
+    def reset_noise(self, mask=None):
+        '''restarts the noise of every env, or of the envs where mask is True'''
+        self.noise.reset(mask)
+
     def remember(self, state, action, reward, new_state, terminated):
+        '''action as returned by choose_action, stored back in [-1, 1]'''
+        action = 2.0 * (np.asarray(action, dtype=np.float32) - self.action_low) / (self.action_high - self.action_low) - 1.0
         self.memory.store_experience(state, action, reward, new_state, terminated)
 
-    def save_models(self):
-        self.actor.save_checkpoint()
-        self.target_actor.save_checkpoint()
-        self.critic.save_checkpoint()
-        self.target_critic.save_checkpoint()
+    def save_models(self, step=None, best=False):
+        '''
+        queues the four networks on the background checkpoint writer; with a
+        step the keep_checkpoints most recent steps are kept
+        '''
+        if self.checkpoints is None:
+            self.checkpoints = CheckpointWriter(keep=self.keep_checkpoints)
+        for network in (self.actor, self.target_actor, self.critic, self.target_critic):
+            network.save_checkpoint(self.checkpoints, step, best)
+
+    def close(self):
+        '''waits for the checkpoints still being written'''
+        if self.checkpoints is not None:
+            self.checkpoints.close()
+            self.checkpoints = None
 
     def load_models(self):
         self.actor.load_checkpoint()
@@ -45,16 +87,17 @@ class Agent():
         self.target_critic.load_checkpoint()
 
     def learn(self):
-        if self.memory.mem_cntr < self.batch_size:
+        if len(self.memory) < self.batch_size:
             return
 
-        states, actions, rewards, states_, done = self.memory.sample_buffer(self.batch_size)
+        states, actions, rewards, states_, done = self.memory.buffer_sample(self.batch_size)
 
-        states = T.tensor(states, dtype=T.float).to(self.actor.device)
-        states_ = T.tensor(states_, dtype=T.float).to(self.actor.device)
-        actions = T.tensor(actions, dtype=T.float).to(self.actor.device)
-        rewards = T.tensor(rewards, dtype=T.float).to(self.actor.device)
-        done = T.tensor(done).to(self.actor.device)
+        # the buffer returns contiguous float32, wrapped without a copy
+        states = T.from_numpy(states).to(self.actor.device)
+        states_ = T.from_numpy(states_).to(self.actor.device)
+        actions = T.from_numpy(actions).to(self.actor.device)
+        rewards = T.from_numpy(rewards).to(self.actor.device)
+        done = T.from_numpy(done).to(self.actor.device)
 
         target_actions = self.target_actor.forward(states_)
         critic_value_ = self.target_critic.forward(states_, target_actions)
@@ -83,25 +126,10 @@ class Agent():
         if tau is None:
             tau = self.tau
 
-        actor_params = self.actor.named_parameters()
-        critic_params = self.critic.named_parameters()
-        target_actor_params = self.target_actor.named_parameters()
-        target_critic_params = self.target_critic.named_parameters()
-
-        critic_state_dict = dict(critic_params)
-        actor_state_dict = dict(actor_params)
-        target_critic_state_dict = dict(target_critic_params)
-        target_actor_state_dict = dict(target_actor_params)
-
-        for name in critic_state_dict:
-            critic_state_dict[name] = tau*critic_state_dict[name].clone() + \
-                                (1-tau)*target_critic_state_dict[name].clone()
-
-        for name in actor_state_dict:
-             actor_state_dict[name] = tau*actor_state_dict[name].clone() + \
-                                 (1-tau)*target_actor_state_dict[name].clone()
-
-        self.target_critic.load_state_dict(critic_state_dict)
-        self.target_actor.load_state_dict(actor_state_dict)
-        #self.target_critic.load_state_dict(critic_state_dict, strict=False)
-        #self.target_actor.load_state_dict(actor_state_dict, strict=False)
\ No newline at end of file
+        # target <- tau*online + (1-tau)*target in place; tau=1 copies the
+        # online weights exactly
+        for network, target in ((self.actor, self.target_actor), (self.critic, self.target_critic)):
+            if tau == 1:
+                target_update.hard_update(target, network)
+            else:
+                target_update.polyak_update(target, network, tau)
@@ -1,25 +1,318 @@
-# replay buffer class
-# need actor and critic networks
-# need target actor and target critic networks
-# batch normalisation
-# deterministic policy
-# soft updates 
-# class for noise
 '''
-Pseudocode:
-initialise critic and actor networks
-initialise target networks with corresponding weights
-initalise replay buffer
-for episode:
-    initialise a random noise N (UO-process) for exploration
-    initial observation state 
-    for t = 1, T do:
-        pick action deterministically according to policy and noise
-        execute action and observe reward, new state, and termination
-        store experience (s,a,r,s') in replay buffer R
-        sample a random minibatch of N transitions (s,a,r,s') from R
-        set y = temporal difference to setup equation to optimise
-        update critic by SGD/adam to minimise loss
-        update actor policy using sampled PG
-        update target networks (soft update)
-'''
\ No newline at end of file
+Actor/learner DDPG training on the SUMO environment.
+
+K actor processes each step their own gymnasium_env/SumoEnv-v0 with a local
+copy of the ActorNetwork and exploration noise, and push transitions into a
+shared-memory ring. The learner (this process) drains the rings into the
+central ReplayBuffer, runs agent.learn() update_to_data times per received
+transition and publishes the actor weights every broadcast_interval updates.
+Actors pick up a new version of the weights every sync_interval steps. A
+learner that falls behind stops draining, so the actors wait on full rings
+rather than running ahead of the ratio; the rings hold two sync intervals by
+default, which bounds how stale the policy behind a transition can be.
+Checkpoints are written in the background at every report, the best one by
+mean episode return.
+
+    python main.py --actors 4 --num-vehicles 20 --num-agents 2 --total-steps 100000
+'''
+import argparse
+import os
+import sys
+import time
+import multiprocessing
+import numpy as np
+import torch as T
+from dotenv import load_dotenv
+
+load_dotenv()
+root_path = os.getenv("SUMO_PROJECT_PATH")
+if root_path is not None:
+    sys.path += [root_path, os.path.join(root_path, "src")]
+
+from ddpg_agent import Agent
+from networks import ActorNetwork
+from noise import OUActionNoise
+
+
+class TransitionRing():
+    '''
+    Fixed-capacity single-producer, single-consumer ring of transitions in
+    shared memory. The actor writes rows and advances `written`, the learner
+    reads them and advances `read`; a full ring makes the actor wait.
+    '''
+    def __init__(self, context, capacity, obs_dim, n_actions):
+        self.capacity = capacity
+        self.obs_dim = obs_dim
+        self.n_actions = n_actions
+        self.row_size = 2 * obs_dim + n_actions + 2
+        self.buffer = context.RawArray('f', capacity * self.row_size)
+        self.written = context.Value('q', 0)
+        self.read = context.Value('q', 0)
+
+    def rows(self):
+        '''the ring as a (capacity, row_size) view, built in each process'''
+        return np.frombuffer(self.buffer, dtype=np.float32).reshape(self.capacity, self.row_size)
+
+    def put(self, rows, state, action, reward, new_state, terminated, stop):
+        while self.written.value - self.read.value >= self.capacity:
+            if stop.is_set():
+                return
+            time.sleep(0.001)
+        row = rows[self.written.value % self.capacity]
+        row[:self.obs_dim] = state
+        row[self.obs_dim:2 * self.obs_dim] = new_state
+        row[2 * self.obs_dim:-2] = action
+        row[-2] = reward
+        row[-1] = terminated
+        # published only after the row is complete
+        self.written.value += 1
+
+    def drain(self, rows, memory, limit):
+        '''moves at most limit complete rows into the replay buffer, returns their number'''
+        start = self.read.value
+        end = min(self.written.value, start + limit)
+        if start >= end:
+            return 0
+        # a replay buffer smaller than the batch takes it in several inserts
+        for chunk in range(start, end, memory.buffer_size):
+            index = np.arange(chunk, min(end, chunk + memory.buffer_size)) % self.capacity
+            batch = rows[index]
+            memory.store_experience(
+                batch[:, :self.obs_dim],
+                batch[:, 2 * self.obs_dim:-2],
+                batch[:, -2],
+                batch[:, self.obs_dim:2 * self.obs_dim],
+                batch[:, -1] > 0.5,
+            )
+        self.read.value = end
+        return end - start
+
+
+class WeightBroadcast():
+    '''flat actor parameters in shared memory plus a version counter'''
+    def __init__(self, context, num_params):
+        self.buffer = context.RawArray('f', num_params)
+        self.version = context.Value('q', 0)
+        self.lock = context.Lock()
+
+    def publish(self, network):
+        flat = T.nn.utils.parameters_to_vector(network.parameters()).detach().cpu().numpy()
+        with self.lock:
+            np.frombuffer(self.buffer, dtype=np.float32)[:] = flat
+            self.version.value += 1
+
+    def load(self, network, version):
+        '''copies the weights into network if newer than version, returns the current version'''
+        if self.version.value == version:
+            return version
+        with self.lock:
+            flat = T.from_numpy(np.frombuffer(self.buffer, dtype=np.float32).copy())
+            version = self.version.value
+        T.nn.utils.vector_to_parameters(flat, network.parameters())
+        return version
+
+
+def make_env(options, index):
+    import gymnasium as gym
+    import gymnasium_env
+    return gym.make(
+        "gymnasium_env/SumoEnv-v0",
+        max_episode_steps=options.episode_steps,
+        disable_env_checker=True,
+        num_vehicles=options.num_vehicles,
+        num_agents=options.num_agents,
+        route_id=options.route_id,
+        backend=options.backend,
+        label=f"actor_{index}",
+        sumo_args=["--nogui", "--seed", str(options.seed + index)],
+        action_repeat=options.action_repeat,
+        profile=False,
+    )
+
+
+def run_actor(index, options, obs_dim, ring, weights, stop, episodes):
+    '''actor process: steps its own env with the latest broadcast policy'''
+    T.set_num_threads(1)
+    env = make_env(options, index)
+    low, high = env.action_space.low, env.action_space.high
+
+    policy = ActorNetwork(0.0, (obs_dim,), options.fc1_dims, options.fc2_dims, options.num_agents, name=f'actor_{index}')
+    policy.to('cpu')
+    noise = OUActionNoise(mu=np.zeros((1, options.num_agents)), seed=options.seed + index)
+    version = weights.load(policy, -1)
+    rows = ring.rows()
+
+    observation, _ = env.reset(seed=options.seed + index)
+    state = np.array(observation, dtype=np.float32)
+    episode_return, step = 0.0, 0
+    while not stop.is_set():
+        if step % options.sync_interval == 0:
+            version = weights.load(policy, version)
+        with T.no_grad():
+            mu = policy(T.from_numpy(state[None]))
+        action = np.clip(mu.numpy()[0] + noise()[0], -1.0, 1.0)
+
+        # the policy acts in [-1, 1], the env in its own bounds
+        observation, reward, terminated, truncated, _ = env.step(low + (action + 1.0) * 0.5 * (high - low))
+        ring.put(rows, state, action, reward, observation, terminated, stop)
+        episode_return += reward
+        step += 1
+
+        if terminated or truncated:
+            episodes.put((index, step, episode_return))
+            observation, _ = env.reset()
+            noise.reset()
+            episode_return = 0.0
+        state = np.array(observation, dtype=np.float32)
+    env.close()
+
+
+def probe_obs_dim(options):
+    # an index no actor uses, so the label and seed stay distinct
+    env = make_env(options, options.actors)
+    observation, _ = env.reset(seed=options.seed)
+    env.close()
+    return int(np.asarray(observation).size)
+
+
+def train(options):
+    context = multiprocessing.get_context("spawn")
+    obs_dim = probe_obs_dim(options)
+
+    agent = Agent(
+        options.alpha, options.beta, (obs_dim,), options.tau, options.num_agents,
+        gamma=options.gamma, max_size=options.buffer_size, fc1_dims=options.fc1_dims,
+        fc2_dims=options.fc2_dims, batch_size=options.batch_size, seed=options.seed,
+    )
+    num_params = sum(p.numel() for p in agent.actor.parameters())
+    weights = WeightBroadcast(context, num_params)
+    weights.publish(agent.actor)
+
+    stop = context.Event()
+    episodes = context.Queue()
+    rings = [TransitionRing(context, options.ring_size, obs_dim, options.num_agents) for _ in range(options.actors)]
+    actors = [
+        context.Process(target=run_actor, args=(i, options, obs_dim, ring, weights, stop, episodes), daemon=True)
+        for i, ring in enumerate(rings)
+    ]
+    for actor in actors:
+        actor.start()
+
+    ring_rows = [ring.rows() for ring in rings]
+    # rows per drain, so that one drain owes at most max_updates_per_drain updates
+    if options.update_to_data > 0:
+        drain_limit = max(1, int(options.max_updates_per_drain / options.update_to_data))
+    else:
+        drain_limit = options.ring_size * options.actors
+    received = updates = 0
+    best_return = -np.inf
+    first_ring = 0
+
+    def due_updates():
+        if len(agent.memory) < max(options.batch_size, options.learning_starts):
+            return 0
+        return int(options.update_to_data * (received - options.learning_starts)) - updates
+
+    def learn(count):
+        nonlocal updates
+        for _ in range(max(0, count)):
+            agent.learn()
+            updates += 1
+            if updates % options.broadcast_interval == 0:
+                weights.publish(agent.actor)
+        return max(0, count)
+
+    start = last_report = time.perf_counter()
+    try:
+        while received < options.total_steps:
+            due = due_updates()
+
+            # a learner behind schedule stops draining, the rings fill up and
+            # the actors wait, which holds the update-to-data ratio
+            drained = 0
+            if due < options.max_updates_per_drain:
+                limit = min(drain_limit, options.total_steps - received)
+                for k in range(len(rings)):
+                    i = (first_ring + k) % len(rings)
+                    drained += rings[i].drain(ring_rows[i], agent.memory, limit - drained)
+                first_ring = (first_ring + 1) % len(rings)
+                received += drained
+
+            learned = learn(min(due_updates(), options.max_updates_per_drain))
+            if not drained and not learned:
+                if not any(actor.is_alive() for actor in actors):
+                    raise RuntimeError("all actor processes exited")
+                time.sleep(0.001)
+
+            now = time.perf_counter()
+            if now - last_report >= options.report_interval:
+                returns = []
+                while not episodes.empty():
+                    returns.append(episodes.get()[2])
+                mean_return = f"{np.mean(returns):.2f}" if returns else "-"
+                print(f"steps {received} updates {updates} steps/s {received / (now - start):.0f} "
+                      f"episodes {len(returns)} mean return {mean_return}")
+                last_report = now
+
+                # written in the background, the learner does not wait
+                if updates:
+                    best = bool(returns) and np.mean(returns) > best_return
+                    if best:
+                        best_return = np.mean(returns)
+                    agent.save_models(step=updates, best=best)
+
+        # the updates still owed for the last transitions
+        learn(due_updates())
+        print(f"done: steps {received} updates {updates}")
+    finally:
+        # actors first, waiting on the checkpoint writer must not keep them running
+        stop.set()
+        for actor in actors:
+            actor.join(timeout=30)
+            if actor.is_alive():
+                actor.terminate()
+        agent.close()
+    return agent
+
+
+def get_options(args=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--actors", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    parser.add_argument("--num-vehicles", type=int, default=20)
+    parser.add_argument("--num-agents", type=int, default=1)
+    parser.add_argument("--route-id", default="route_0")
+    parser.add_argument("--backend", default=os.getenv("SUMO_BACKEND", "libsumo"))
+    parser.add_argument("--action-repeat", type=int, default=1)
+    parser.add_argument("--episode-steps", type=int, default=1000)
+    parser.add_argument("--total-steps", type=int, default=100000)
+    parser.add_argument("--learning-starts", type=int, default=1000)
+    parser.add_argument("--update-to-data", type=float, default=1.0,
+                        help="gradient updates per environment transition")
+    parser.add_argument("--broadcast-interval", type=int, default=100,
+                        help="gradient updates between publishing the actor weights")
+    parser.add_argument("--sync-interval", type=int, default=50,
+                        help="env steps between actors checking for new weights")
+    parser.add_argument("--max-updates-per-drain", type=int, default=64)
+    parser.add_argument("--ring-size", type=int, default=None,
+                        help="transitions an actor may run ahead of the learner, "
+                             "by default 2 * sync-interval")
+    parser.add_argument("--buffer-size", type=int, default=1000000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--alpha", type=float, default=1e-4)
+    parser.add_argument("--beta", type=float, default=1e-3)
+    parser.add_argument("--tau", type=float, default=0.005)
+    parser.add_argument("--gamma", type=float, default=0.99)
+    parser.add_argument("--fc1-dims", type=int, default=400)
+    parser.add_argument("--fc2-dims", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--report-interval", type=float, default=10.0)
+    options = parser.parse_args(args)
+    # a full ring makes the actor wait, so it never acts on weights more than
+    # a couple of syncs older than the transitions the learner has seen
+    if options.ring_size is None:
+        options.ring_size = 2 * options.sync_interval
+    return options
+
+
+if __name__ == "__main__":
+    train(get_options())
@@ -4,10 +4,11 @@ import torch as T
 import torch.nn as nn
 import torch.nn.functional as F
 import torch.optim as optim
+from checkpoint import atomic_save
 
 class CriticNetwork(nn.Module):
     def __init__(self, beta, input_dims, fc1_dims, fc2_dims, n_actions, name, chkpt_dir='tmp/ddpg'):
-        super.__init__()
+        super().__init__()
         self.input_dims = input_dims
         self.fc1_dims = fc1_dims
         self.fc2_dims = fc2_dims
@@ -51,7 +52,7 @@ class CriticNetwork(nn.Module):
 
         self.optimizer = optim.Adam(self.parameters(), lr=beta, weight_decay=0.01)
         
-        self.device = T.device('cuda:0' if T.cuda.is_available() else 'cuda:1')
+        self.device = T.device('cuda:0' if T.cuda.is_available() else 'cpu')
         self.to(self.device)
 
     def forward(self, state, action):
@@ -65,12 +66,21 @@ class CriticNetwork(nn.Module):
         action = self.action_value(action)
         
         state_action_value = F.relu(T.add(state, action))
+        state_action_value = self.q(state_action_value)
 
         return state_action_value
         
-    def save_checkpoint(self):
-        print('... saving checkpoint ...')
-        T.save(self.state_dict(), self.checkpoint_file)
+    def save_checkpoint(self, writer=None, step=None, best=False):
+        '''
+        with a CheckpointWriter the checkpoint is written in the background,
+        keeping the most recent steps and, if best, the best checkpoint
+        '''
+        if writer is None:
+            print('... saving checkpoint ...')
+            atomic_save(self.state_dict(), self.checkpoint_file)
+            return
+        best_file = os.path.join(self.checkpoint_dir, self.name+'_best') if best else None
+        writer.save(self.state_dict(), self.checkpoint_file, step, best_file)
 
     def load_checkpoint(self):
         print('... loading checkpoint ...')
@@ -79,11 +89,11 @@ class CriticNetwork(nn.Module):
     def save_best(self):
         print('... saving best checkpoint ...')
         checkpoint_file = os.path.join(self.checkpoint_dir, self.name+'_best')
-        T.save(self.state_dict(), checkpoint_file)
+        atomic_save(self.state_dict(), checkpoint_file)
 
 class ActorNetwork(nn.Module):
     def __init__(self, alpha, input_dims, fc1_dims, fc2_dims, n_actions, name, chkpt_dir='tmp/ddpg'):
-        super.__init__()
+        super().__init__()
         self.input_dims = input_dims 
         self.fc1_dims = fc1_dims 
         self.fc2_dims = fc2_dims 
@@ -115,7 +125,7 @@ class ActorNetwork(nn.Module):
         self.mu.bias.data.uniform_(-f3, f3)
 
         self.optimizer = optim.Adam(self.parameters(), lr=alpha)
-        self.device = T.device('cuda:0' if T.cuda.is_available() else 'cuda:1')
+        self.device = T.device('cuda:0' if T.cuda.is_available() else 'cpu')
         self.to(self.device)
 
     def forward(self, x):
@@ -129,9 +139,17 @@ class ActorNetwork(nn.Module):
         x = T.tanh(x)
         return x
     
-    def save_checkpoint(self):
-        print('... saving checkpoint ...')
-        T.save(self.state_dict(), self.checkpoint_file)
+    def save_checkpoint(self, writer=None, step=None, best=False):
+        '''
+        with a CheckpointWriter the checkpoint is written in the background,
+        keeping the most recent steps and, if best, the best checkpoint
+        '''
+        if writer is None:
+            print('... saving checkpoint ...')
+            atomic_save(self.state_dict(), self.checkpoint_file)
+            return
+        best_file = os.path.join(self.checkpoint_dir, self.name+'_best') if best else None
+        writer.save(self.state_dict(), self.checkpoint_file, step, best_file)
 
     def load_checkpoint(self):
         print('... loading checkpoint ...')
@@ -140,7 +158,7 @@ class ActorNetwork(nn.Module):
     def save_best(self):
         print('... saving best checkpoint ...')
         checkpoint_file = os.path.join(self.checkpoint_dir, self.name+'_best')
-        T.save(self.state_dict(), checkpoint_file)
+        atomic_save(self.state_dict(), checkpoint_file)
 
     def eval(self):
         '''
@@ -1,22 +1,47 @@
+import math
 import numpy as np
+import torch as T
 
 class OUActionNoise():
-    def __init__(self, mu, sigma=0.15, theta=0.2, dt=1e-2, x0=None):
+    '''
+    Ornstein-Uhlenbeck noise with one independent process per row of mu,
+    e.g. mu of shape (num_envs, n_actions) for a vector env. Gaussian draws
+    come from a seeded Generator, block_size steps at a time.
+    '''
+    def __init__(self, mu, sigma=0.15, theta=0.2, dt=1e-2, x0=None, seed=None, block_size=1024, device='cpu'):
         self.theta = theta
-        self.mu = mu
+        self.mu = np.asarray(mu, dtype=np.float32)
         self.sigma = sigma
         self.dt = dt
         self.x0 = x0
+        self.device = device
+        self.rng = np.random.default_rng(seed)
+        self.block_size = block_size
+        self.block_index = block_size
         self.reset()
 
     def __call__(self):
+        if self.block_index == self.block_size:
+            self.block = self.rng.standard_normal((self.block_size, *self.mu.shape), dtype=np.float32)
+            self.block_index = 0
+        normal = self.block[self.block_index]
+        self.block_index += 1
+
         x = self.x_prev + self.theta * (self.mu - self.x_prev) * self.dt + \
-                self.sigma * np.sqrt(self.dt) * np.random.normal(size=self.mu.shape)
+                self.sigma * math.sqrt(self.dt) * normal
         self.x_prev = x
 
         return x
 
-    def reset(self):
-        self.x_prev = self.x0 if self.x0 is not None else np.zeros_like(self.mu)
+    def sample_tensor(self):
+        '''the next noise step as a float32 tensor on the device'''
+        return T.from_numpy(self()).to(self.device)
 
-        
\ No newline at end of file
+    def reset(self, mask=None):
+        '''restarts every process, or only the rows where mask is True'''
+        x0 = self.x0 if self.x0 is not None else np.zeros_like(self.mu)
+        x0 = np.broadcast_to(np.asarray(x0, dtype=np.float32), self.mu.shape)
+        if mask is None:
+            self.x_prev = x0.copy()
+        else:
+            self.x_prev[mask] = x0[mask]
@@ -1,32 +1,110 @@
+import json
+import os
 import numpy as np
 
+# transition count of a memory-mapped buffer, next to its arrays
+COUNT_FILE = "count.json"
+
 class ReplayBuffer():
-    def __init__(self, max_size, input_shape, n_actions):
+    '''
+    Ring buffer of (state, action, reward, new state, terminated) transitions,
+    stored as float32. With memmap_dir every array is a .npy file memory-mapped
+    from that directory (s, a, r, s2, d, the layout of export_transitions), so
+    capacity is bounded by disk instead of RAM. A new buffer overwrites the
+    files, ReplayBuffer.load maps existing ones in place.
+
+    store_experience takes one transition or a batch from a vector env (leading
+    batch axis); buffer_sample returns contiguous float32 arrays that
+    torch.from_numpy can wrap without a copy.
+    '''
+    def __init__(self, max_size, input_shape, n_actions, memmap_dir=None, seed=None, mode="w+"):
         self.buffer_size = max_size
         self.buffer_count = 0
-        self.state_memory = np.zeros((self.buffer_size, *input_shape))
-        self.new_state_memory = np.zeros((self.buffer_size, *input_shape))
-        self.action_memory = np.zeros((self.buffer_size, *n_actions))
-        self.reward_memory = np.zeros(self.buffer_size)
-        self.terminal_memory = np.zeros(self.buffer_size, dtype=np.bool) 
-    
-    def store_experience(self, state, action, reward, new_state, terminated=False):
-        index = self.buffer_count % self.buffer_size
-        
-        self.state_memory[index] = state
-        self.new_state_memory[index] = new_state
-        self.reward_memory[index] = reward
-        self.action_memory[index] = action
-        self.terminal_memory[index] = terminated
-        self.buffer_count += 1
+        self.input_shape = tuple(int(n) for n in np.atleast_1d(input_shape))
+        self.action_shape = tuple(int(n) for n in np.atleast_1d(n_actions))
+        self.memmap_dir = memmap_dir
+        self.mode = mode
+        self.rng = np.random.default_rng(seed)
+
+        self.state_memory = self._allocate("s", self.input_shape, np.float32)
+        self.new_state_memory = self._allocate("s2", self.input_shape, np.float32)
+        self.action_memory = self._allocate("a", self.action_shape, np.float32)
+        self.reward_memory = self._allocate("r", (), np.float32)
+        self.terminal_memory = self._allocate("d", (), np.bool_)
+
+    def _allocate(self, name, shape, dtype) -> np.ndarray:
+        shape = (self.buffer_size, *shape)
+        if self.memmap_dir is None:
+            return np.zeros(shape, dtype=dtype)
+        os.makedirs(self.memmap_dir, exist_ok=True)
+        path = os.path.join(self.memmap_dir, f"{name}.npy")
+        if self.mode == "w+":
+            return np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+        memory = np.lib.format.open_memmap(path, mode=self.mode)
+        if memory.shape != shape or memory.dtype != dtype:
+            raise ValueError(f"{path} holds {memory.dtype} {memory.shape}, expected {np.dtype(dtype)} {shape}")
+        return memory
+
+    @classmethod
+    def load(cls, memmap_dir, seed=None):
         '''
-        why is buffer size predetermined?
-        why the modulus operation
+        maps the arrays in memmap_dir, of a memory-mapped buffer or of
+        export_transitions, in place with mode "r+"; the size comes from the
+        arrays, the count from the last flush, and an export counts as full.
+        New transitions overwrite the oldest ones in the files.
         '''
-        
+        states = np.load(os.path.join(memmap_dir, "s.npy"), mmap_mode="r")
+        actions = np.load(os.path.join(memmap_dir, "a.npy"), mmap_mode="r")
+        buffer = cls(len(states), states.shape[1:], actions.shape[1:], memmap_dir, seed, mode="r+")
+
+        count_path = os.path.join(memmap_dir, COUNT_FILE)
+        if os.path.exists(count_path):
+            with open(count_path) as f:
+                buffer.buffer_count = json.load(f)["count"]
+        else:
+            buffer.buffer_count = buffer.buffer_size
+        return buffer
+
+    def __len__(self) -> int:
+        return min(self.buffer_count, self.buffer_size)
+
+    def store_experience(self, state, action, reward, new_state, terminated=False):
+        '''one transition, or a batch of them with a leading axis'''
+        state = np.asarray(state, dtype=np.float32)
+        batched = state.ndim == len(self.input_shape) + 1
+        n = state.shape[0] if batched else 1
+        if n > self.buffer_size:
+            raise ValueError(f"batch of {n} transitions exceeds the buffer size {self.buffer_size}")
+
+        # the oldest transitions are overwritten once the buffer is full; a
+        # batch crossing the end is written as two slices
+        start = self.buffer_count % self.buffer_size
+        first = min(n, self.buffer_size - start)
+        parts = [(slice(start, start + first), slice(0, first))]
+        if first < n:
+            parts.append((slice(0, n - first), slice(first, n)))
+
+        columns = (
+            (self.state_memory, state),
+            (self.new_state_memory, new_state),
+            (self.action_memory, action),
+            (self.reward_memory, reward),
+            (self.terminal_memory, terminated),
+        )
+        for memory, values in columns:
+            values = np.asarray(values, dtype=memory.dtype)
+            if not batched:
+                values = values.reshape((1, *memory.shape[1:]))
+            elif values.ndim == 1 and memory.ndim == 2:
+                values = values.reshape(n, -1)
+            for target, source in parts:
+                memory[target] = values[source]
+        self.buffer_count += n
+
     def buffer_sample(self, batch_size):
-        max_index = min(self.buffer_count, self.buffer_size)
-        batch = np.random.choice(max_index, batch_size)
+        batch = self.rng.integers(len(self), size=batch_size)
+        # sorted indices read a memory-mapped buffer front to back
+        batch.sort()
 
         states = self.state_memory[batch]
         actions = self.action_memory[batch]
@@ -34,4 +112,14 @@ class ReplayBuffer():
         new_states = self.new_state_memory[batch]
         terminated = self.terminal_memory[batch]
 
-        return states, actions, rewards, new_states, terminated
\ No newline at end of file
+        return states, actions, rewards, new_states, terminated
+
+    def flush(self):
+        '''writes a memory-mapped buffer and its count to disk, see load'''
+        if self.memmap_dir is None:
+            return
+        for memory in (self.state_memory, self.new_state_memory, self.action_memory,
+                       self.reward_memory, self.terminal_memory):
+            memory.flush()
+        with open(os.path.join(self.memmap_dir, COUNT_FILE), "w") as f:
+            json.dump({"count": self.buffer_count}, f)
@@ -0,0 +1,23 @@
+'''
+Modules shared with TUD_RL from TUD_RL-main/tud_rl/common, loaded from
+their files since importing the tud_rl package needs gym. They only depend
+on torch and the standard library.
+'''
+import importlib.util
+import os
+import sys
+
+COMMON_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', '..', 'TUD_RL-main', 'tud_rl', 'common'
+)
+
+
+def load(name):
+    '''the module tud_rl/common/<name>.py, loaded once per process'''
+    module_name = f'tud_rl_common_{name}'
+    if module_name not in sys.modules:
+        spec = importlib.util.spec_from_file_location(module_name, os.path.join(COMMON_DIR, f'{name}.py'))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[module_name] = module
+        spec.loader.exec_module(module)
+    return sys.modules[module_name]
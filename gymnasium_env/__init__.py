@@ -8,4 +8,15 @@ from gymnasium.envs.registration import register
 register(
     id="gymnasium_env/SumoEnv-v0",
     entry_point="gymnasium_env.envs:DemoEnv",
+    vector_entry_point="gymnasium_env.envs:SumoVectorEnv",
+)
+
+register(
+    id="gymnasium_env/RingVectorEnv-v0",
+    vector_entry_point="gymnasium_env.envs:RingVectorEnv",
+)
+
+register(
+    id="gymnasium_env/TrafficLightEnv-v0",
+    entry_point="gymnasium_env.envs:TrafficLightEnv",
 )
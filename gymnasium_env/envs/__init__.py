@@ -1 +1,9 @@
 from gymnasium_env.envs.sumo_env import DemoEnv
+from gymnasium_env.envs.sumo_vector_env import SumoVectorEnv
+from gymnasium_env.envs.ring_vector_env import RingVectorEnv
+from gymnasium_env.envs.multi_agent_sumo_env import MultiAgentSumoEnv
+from gymnasium_env.envs.traffic_light_env import TrafficLightEnv
+
+# MultiAgentSumoEnv is import-only: it follows PettingZoo's ParallelEnv API
+# (per-agent spaces, no gymnasium.Env base), which gym.make cannot wrap, e.g.
+#     from gymnasium_env.envs import MultiAgentSumoEnv
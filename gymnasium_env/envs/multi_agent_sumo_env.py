@@ -0,0 +1,119 @@
+import os
+import sys
+import numpy as np
+from gymnasium import spaces
+from gymnasium.utils import seeding
+from dotenv import load_dotenv
+from src.simulation import Simulation
+
+load_dotenv()
+root_path = os.getenv("SUMO_PROJECT_PATH")
+sys.path.append(root_path)
+
+class MultiAgentSumoEnv:
+    '''
+    Parallel multi-agent version of DemoEnv in the style of PettingZoo's
+    ParallelEnv. All agents act at once, but observations, actions and rewards
+    are stacked arrays in possible_agents order instead of per-agent dicts:
+    observations (num_agents, obs_dim), actions (num_agents, 1).
+
+    Each agent observes its own (x, y, speed) followed by the (x, y, speed) of
+    every background vehicle. Agents share the mean vehicle speed as reward.
+    Agents still waiting for insertion have zero rows and are flagged in
+    infos["valid"]. Not registered with gymnasium, construct it directly.
+    '''
+    metadata = {"name": "sumo_multi_agent_v0", "render_modes": []}
+
+    def __init__(
+        self, num_vehicles, num_agents, route_id, backend=None, warmup_steps=None,
+        label=None, sumo_args=None, action_repeat=1
+    ):
+        if num_agents < 1:
+            raise ValueError("MultiAgentSumoEnv needs at least one agent")
+
+        self._num_vehicles = num_vehicles
+        self._num_agents = num_agents
+        self._action_repeat = action_repeat
+        self._simulation = Simulation(
+            num_vehicles, num_agents, route_id, backend, warmup_steps, label, action_repeat
+        )
+        self._simulation.setup_sumo()
+        self._simulation.get_options(sumo_args)
+        self._simulation.start_sumo()
+        self._simulation.simulation_init()
+        self._vehicle_ids, self._agent_ids = self._simulation.get_ids()
+        self._observation = self._simulation.get_observation()
+
+        self.possible_agents = list(self._agent_ids)
+        self.agents = list(self._agent_ids)
+
+        # own (x, y, speed) followed by (x, y, speed) for each vehicle
+        obs_dim = 3 + num_vehicles * 3
+        high = np.array([np.inf] * obs_dim)
+        self._single_observation_space = spaces.Box(low=-high, high=high, dtype=np.float32)
+        # acceleration (a), where -3 < a < 1 (ms^-2)
+        self._single_action_space = spaces.Box(
+            low=np.array([-3]),
+            high=np.array([1]),
+            dtype=np.float32
+        )
+        self.observation_spaces = {a: self._single_observation_space for a in self.possible_agents}
+        self.action_spaces = {a: self._single_action_space for a in self.possible_agents}
+
+        self._obs = np.zeros((num_agents, obs_dim), dtype=np.float32)
+        self._np_random, _ = seeding.np_random()
+
+    def observation_space(self, agent) -> spaces.Box:
+        return self.observation_spaces[agent]
+
+    def action_space(self, agent) -> spaces.Box:
+        return self.action_spaces[agent]
+
+    def reset(self, seed=None, options=None) -> tuple[np.ndarray, dict]:
+        if seed is not None:
+            self._np_random, _ = seeding.np_random(seed)
+
+        options = options or {}
+        snapshot = options.get("snapshot")
+        if snapshot is None:
+            snapshot = int(self._np_random.integers(self._simulation.get_num_snapshots()))
+        self._simulation.simulation_reset(snapshot)
+        self.agents = list(self.possible_agents)
+
+        return self._get_observations(), self._get_infos()
+
+    def step(self, actions) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, dict]:
+        actions = np.clip(
+            np.asarray(actions, dtype=np.float32).reshape(self._num_agents),
+            self._single_action_space.low[0],
+            self._single_action_space.high[0],
+        )
+        self._simulation.set_acceleration(actions)
+        self._simulation.simulation_step()
+
+        if self._action_repeat == 1:
+            reward = self._observation.mean_speed()
+        else:
+            reward = self._simulation.get_interval_speed()
+        rewards = np.full(self._num_agents, reward, dtype=np.float32)
+        terminations = np.full(self._num_agents, self._simulation.get_terminated())
+        truncations = np.zeros(self._num_agents, dtype=bool)
+        if terminations.all():
+            self.agents = []
+
+        return self._get_observations(), rewards, terminations, truncations, self._get_infos()
+
+    def _get_observations(self) -> np.ndarray:
+        # overwritten in place by the next step
+        self._obs[:, :3] = self._observation.get_agent_rows()
+        self._obs[:, 3:] = self._observation.get_observation()
+        return self._obs
+
+    def _get_infos(self) -> dict:
+        return {"valid": self._observation.get_agent_valid().copy()}
+
+    def render(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self._simulation.end_simulation()
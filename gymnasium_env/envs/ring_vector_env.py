@@ -0,0 +1,98 @@
+import os
+import sys
+import numpy as np
+from gymnasium import spaces
+from gymnasium.vector import VectorEnv, AutoresetMode
+from dotenv import load_dotenv
+from src.idm_ring import BatchedIDMRing
+
+load_dotenv()
+root_path = os.getenv("SUMO_PROJECT_PATH")
+sys.path.append(root_path)
+
+class RingVectorEnv(VectorEnv):
+    '''
+    num_envs ring-road episodes simulated in one process by BatchedIDMRing.
+    Observations, actions and rewards follow DemoEnv: (x, y, speed) of every
+    non-agent vehicle, one acceleration per agent and the mean vehicle speed.
+    Finished episodes are reset on the following step (NEXT_STEP autoreset).
+    '''
+    metadata = {"autoreset_mode": AutoresetMode.NEXT_STEP}
+
+    def __init__(
+        self, num_envs, num_vehicles, num_agents, route_id, config_file=None,
+        max_episode_steps=None, copy=True
+    ):
+        super().__init__()
+        if config_file is None:
+            config_file = os.path.join(root_path, "config/demo_00.sumocfg")
+
+        self.num_envs = num_envs
+        self._num_vehicles = num_vehicles
+        self._num_agents = num_agents
+        self._max_episode_steps = max_episode_steps
+        self._copy = copy
+        self._engine = BatchedIDMRing(config_file, route_id, num_envs, num_vehicles, num_agents)
+
+        # (x, y, speed) for each vehicle
+        high = np.array([np.inf] * num_vehicles * 3)
+        self.single_observation_space = spaces.Box(low=-high, high=high, dtype=np.float32)
+        # acceleration (a), where -3 < a < 1 (ms^-2), for each agent
+        n_actions = max(num_agents, 1)
+        self.single_action_space = spaces.Box(
+            low=np.array([-3] * n_actions),
+            high=np.array([1] * n_actions),
+            dtype=np.float32
+        )
+        self.observation_space = spaces.Box(
+            low=-np.inf, high=np.inf, shape=(num_envs, num_vehicles * 3), dtype=np.float32
+        )
+        self.action_space = spaces.Box(
+            low=np.tile(self.single_action_space.low, (num_envs, 1)),
+            high=np.tile(self.single_action_space.high, (num_envs, 1)),
+            dtype=np.float32
+        )
+
+        self._obs = np.zeros((num_envs, num_vehicles, 3), dtype=np.float32)
+        self._elapsed = np.zeros(num_envs, dtype=np.int64)
+        self._autoreset = np.zeros(num_envs, dtype=bool)
+        self._terminated = np.zeros(num_envs, dtype=bool)
+
+    def reset(self, seed=None, options=None) -> tuple[np.ndarray, dict]:
+        super().reset(seed=seed)
+        self._engine.reset(np.ones(self.num_envs, dtype=bool), self.np_random)
+        self._elapsed[:] = 0
+        self._autoreset[:] = False
+        return self._get_observation(), {}
+
+    def step(self, actions) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, dict]:
+        actions = np.asarray(actions, dtype=np.float64).reshape(self.num_envs, -1)
+        actions = np.clip(actions, self.single_action_space.low, self.single_action_space.high)
+        self._engine.step(actions[:, :self._num_agents])
+
+        # envs that finished on the previous step start over instead
+        reset = self._autoreset
+        self._engine.reset(reset, self.np_random)
+        self._elapsed += 1
+        self._elapsed[reset] = 0
+
+        reward = self._engine.speed[:, :self._num_vehicles].mean(axis=1)
+        reward[reset] = 0.0
+        if self._max_episode_steps is None:
+            truncated = np.zeros(self.num_envs, dtype=bool)
+        else:
+            truncated = self._elapsed >= self._max_episode_steps
+        # vehicles circle the ring forever, episodes only end by truncation
+        terminated = self._terminated
+        self._autoreset = terminated | truncated
+
+        return self._get_observation(), reward, terminated.copy(), truncated, {}
+
+    def _get_observation(self) -> np.ndarray:
+        x, y = self._engine.positions()
+        nv = self._num_vehicles
+        self._obs[..., 0] = x[:, :nv]
+        self._obs[..., 1] = y[:, :nv]
+        self._obs[..., 2] = self._engine.speed[:, :nv]
+        observation = self._obs.reshape(self.num_envs, -1)
+        return observation.copy() if self._copy else observation
@@ -4,29 +4,57 @@ import numpy as np
 import os
 import sys
 from typing import List
-from statistics import mean
 from dotenv import load_dotenv
-from src.simulation import Simulation
+from src.simulation import Simulation, simulation_config
+from src.state_bank import StateBank, config_key
 
 load_dotenv()
 root_path = os.getenv("SUMO_PROJECT_PATH")
 sys.path.append(root_path)
 
 class DemoEnv(gym.Env):
-    metadata = {"render.modes": ["console"]}
-    # WARN: The environment creator metadata doesn't include `render_modes`, contains: ['render.modes']
-    def __init__(self, num_vehicles, num_agents, route_id):
+    # render() only prints, there is no gymnasium render mode to create the env with
+    metadata = {"render.modes": ["console"], "render_modes": []}
+    def __init__(
+        self, num_vehicles, num_agents, route_id, backend=None, warmup_steps=None,
+        label=None, sumo_args=None, action_repeat=1, profile=False, num_neighbours=0,
+        context_radius=50.0, context_lanes=None, gap_features=False, pool=None,
+        state_bank=None, config_file=None, mesosim=False, copy=True
+    ):
         super().__init__()
     
         self._num_vehicles = num_vehicles
         self._num_agents = num_agents
         self._route_id = route_id
-        self._simulation = Simulation(num_vehicles, num_agents, route_id)
-        self._simulation.setup_sumo()
-        self._simulation.get_options()
-        self._simulation.start_sumo()
-        self._simulation.simulation_init()
-        self._vehicle_ids, self._agent_ids = self._simulation.get_ids()
+        self._backend = backend
+        self._warmup_steps = warmup_steps
+        self._label = label
+        self._sumo_args = sumo_args
+        self._action_repeat = action_repeat
+        self._profile = profile
+        # with copy=False reset and step return a view onto the simulation's
+        # buffer, which the next step overwrites; only for callers that
+        # consume each observation before stepping again
+        self._copy = copy
+        self._simulation_options = {
+            "num_neighbours": num_neighbours,
+            "context_radius": context_radius,
+            "context_lanes": context_lanes,
+            "gap_features": gap_features,
+            "config_file": config_file,
+            # mesoscopic SUMO, observations and actions keep their shape
+            "mesosim": mesosim,
+        }
+        # a SimulationPool hands out started simulations instead, which must
+        # have been configured like this env
+        self._pool = pool
+        self._simulation = None
+        self._recorder = None
+        # directory of a bank made by generate_state_bank, episodes then start
+        # from its states instead of the warm-up snapshots
+        self._state_bank_dir = state_bank
+        self._state_bank = None
+        self._start_simulation()
         
         self.observation_space = spaces.Dict({
             "agents": spaces.Dict({
@@ -42,21 +70,73 @@ class DemoEnv(gym.Env):
                 ))
             }),
         })
-        # (x, y, speed) for each vehicle
-        high = np.array([np.inf] * self._num_vehicles * 3) 
+        if self._simulation.get_neighbours() is not None:
+            # own speed and (dx, dy, dv) of the nearest vehicles, per agent
+            high = np.array([np.inf] * self._num_agents * (1 + num_neighbours * 3))
+        else:
+            # (x, y, speed) for each vehicle
+            high = np.array([np.inf] * self._num_vehicles * 3) 
+        # followed by the four gap features of each agent
+        self._obs = None
+        if gap_features:
+            high = np.concatenate((high, [np.inf] * self._num_agents * 4))
+            self._obs = np.zeros(len(high), dtype=np.float32)
         
         self.observation_space = spaces.Box(
             low=-high, 
             high=high,
             dtype=np.float32
         )
-        # acceleration (a), where -3 < a < 1 (ms^-2)
+        # acceleration (a), where -3 < a < 1 (ms^-2), for each agent
+        n_actions = max(self._num_agents, 1)
         self.action_space = spaces.Box(
-            low=np.array([-3]), 
-            high=np.array([1]), 
+            low=np.array([-3] * n_actions), 
+            high=np.array([1] * n_actions), 
             dtype=np.float32
         )
 
+    def _start_simulation(self) -> None:
+        if self._pool is not None:
+            self._simulation = self._pool.acquire()
+            expected = simulation_config(
+                self._num_vehicles, self._num_agents, self._route_id, self._warmup_steps,
+                self._action_repeat, **self._simulation_options
+            )
+            config = self._simulation.get_config()
+            mismatch = [key for key in expected if config[key] != expected[key]]
+            if mismatch:
+                self._pool.release(self._simulation)
+                self._simulation = None
+                raise ValueError(
+                    "pooled simulation does not match the environment: "
+                    + ", ".join(f"{key} {config[key]!r} != {expected[key]!r}" for key in mismatch)
+                )
+        else:
+            self._simulation = Simulation(
+                self._num_vehicles, self._num_agents, self._route_id,
+                self._backend, self._warmup_steps, self._label, self._action_repeat,
+                self._profile, **self._simulation_options
+            )
+            self._simulation.setup_sumo()
+            self._simulation.get_options(self._sumo_args)
+            self._simulation.start_sumo()
+            self._simulation.simulation_init()
+        self._vehicle_ids, self._agent_ids = self._simulation.get_ids()
+
+        if self._state_bank_dir is not None and self._state_bank is None:
+            key = config_key(
+                self._simulation.get_config_file(), self._route_id, self._num_vehicles,
+                self._num_agents, self._simulation.get_backend(), self._simulation.get_mesosim()
+            )
+            self._state_bank = StateBank(self._state_bank_dir, key)
+
+    def set_recorder(self, recorder) -> None:
+        '''
+        records every following episode, from the next reset on, into a
+        TrajectoryRecorder; None stops recording, closing stays with the caller
+        '''
+        self._recorder = recorder
+
     def get_info(self):
         ''' todo'''
         pass
@@ -64,56 +144,103 @@ class DemoEnv(gym.Env):
     def reset(self, seed=None, options=None) -> tuple[List[float], dict]:
         super().reset(seed=seed)
         
-        if not hasattr(self, "_simulation") or self._simulation is None:
-            self._simulation = Simulation(self._num_vehicles, self._num_agents, self._route_id)
-            self._simulation.setup_sumo()
-            self._simulation.get_options()
-            self._simulation.start_sumo()
-            self._simulation.simulation_init()
-            self._vehicle_ids, self._agent_ids = self._simulation.get_ids()
+        # options={"restart": True} replaces the simulation by a fresh one
+        options = options or {}
+        if options.get("restart") and self._simulation is not None:
+            self._simulation.end_simulation()
+            self._simulation = None
+
+        if self._simulation is None:
+            self._start_simulation()
+
+        # options={"snapshot": i} selects a warm-up state, {"bank_state": i} a
+        # state of the bank; otherwise one is drawn from the bank if there is
+        # one, else from the warm-up snapshots
+        snapshot = options.get("snapshot")
+        bank_state = options.get("bank_state")
+        if bank_state is not None or (snapshot is None and self._state_bank is not None):
+            if self._state_bank is None:
+                raise ValueError("bank_state given but the environment has no state bank")
+            if bank_state is None:
+                state_file, step = self._state_bank.sample(self.np_random)
+            else:
+                state_file, step = self._state_bank.get(bank_state)
+            self._simulation.load_state(state_file, step)
         else:
-            # self._simulation.simulation_reset()
-            pass
+            if snapshot is None:
+                snapshot = int(self.np_random.integers(self._simulation.get_num_snapshots()))
+            self._simulation.simulation_reset(snapshot)
         
-        obs = self._simulation.get_obs() 
+        observation = self._get_observation()
+        if self._recorder is not None:
+            fleet = self._simulation.get_observation()
+            self._recorder.start_episode(observation, fleet.get_fleet_rows(), fleet.get_fleet_valid())
+        return observation, {}
         
-        print("Observation:", obs)
-        print("Expected shape:", self.observation_space.shape)
-        print("Actual shape:", obs.shape)
-        
-        return obs, {}
-        
-    def step(self, action) -> tuple[object, float, bool, object]:
-        self._simulation.simulation_step()
+    def step(self, action) -> tuple[np.ndarray, float, bool, bool, dict]:
+        profiler = self._simulation.get_profiler()
+        start = profiler.now()
+
+        # the action is held for action_repeat SUMO steps
         self._simulation.set_acceleration(action)
+        self._simulation.simulation_step()
         
-        vehicle_info = [None] * len(self._vehicle_ids)
-        posns, speeds = self._simulation.get_obs()
+        t = profiler.now()
+        observation = self._get_observation()
+        t = profiler.record("observation", t)
+        reward = self.calculate_reward()
+        t = profiler.record("reward", t)
+        # a TraCI round-trip, unlike the reward
+        terminated = self._simulation.get_terminated()
+        profiler.record("terminated", t)
+        profiler.record("step", start)
+        # per-phase durations of this step in ns, see get_profile for aggregates
+        info = {"timing_ns": profiler.get_last()} if profiler.enabled() else {}
 
-        for id in self._vehicle_ids:
-            id_index = int(id)
-            vehicle_info[id_index] = (
-                posns[id_index][0], 
-                posns[id_index][1], 
-                speeds[id_index]
+        if self._recorder is not None:
+            fleet = self._simulation.get_observation()
+            self._recorder.record(
+                observation, action, reward, terminated, False,
+                fleet.get_fleet_rows(), fleet.get_fleet_valid()
             )
 
-        padded_obs = np.pad(vehicle_info, (0, len(self._vehicle_ids) * 3))
-        observation = np.array(padded_obs)
-        reward = self.calculate_reward()
-        done = self._simulation.get_terminated()
-        info = {}
+        return observation, reward, terminated, False, info
+
+    def _get_observation(self) -> np.ndarray:
+        # (x, y, speed) per vehicle, zeros for vehicles not in the network,
+        # assembled in the simulation's buffer that the next step overwrites
+        neighbours = self._simulation.get_neighbours()
+        if neighbours is not None:
+            observation = neighbours.get_observation()
+        else:
+            observation = self._simulation.get_observation().get_observation()
+        if self._obs is not None:
+            n = len(observation)
+            self._obs[:n] = observation
+            self._obs[n:] = self._simulation.get_gaps()[self._num_vehicles:].reshape(-1)
+            observation = self._obs
+        return observation.copy() if self._copy else observation
 
-        return observation, reward, done, info
+    def get_profile(self) -> dict:
+        '''rolling per-phase timing statistics, empty if profiling is off'''
+        return self._simulation.get_profiler().summary()
 
     def render(self, mode="console") -> None:
         if mode == "console":
             print("environment state...")
     
     def close(self) -> None:
-        self._simulation.end_simulation()
+        if self._simulation is not None:
+            self._simulation.end_simulation()
+            self._simulation = None
 
     def calculate_reward(self) -> float:
-        speeds, _ = self._simulation.get_obs()
-        filtered_speeds = [x for x in speeds if x]
-        return mean(filtered_speeds)
+        if self._simulation.get_neighbours() is not None:
+            # only the agents are subscribed, the reward covers their
+            # surroundings, aggregated over the interval like below
+            return self._simulation.get_context_speed()
+        if self._action_repeat == 1:
+            return self._simulation.get_observation().mean_speed()
+        # summed over the skipped steps; termination needs no aggregation as
+        # vehicles never re-enter once the simulation has emptied
+        return self._simulation.get_interval_speed()
@@ -0,0 +1,68 @@
+import itertools
+import os
+from functools import partial
+from gymnasium.vector import AsyncVectorEnv, AutoresetMode
+from gymnasium_env.envs.sumo_env import DemoEnv
+
+# numbers the vector envs of this process, for distinct default labels
+_instances = itertools.count()
+# what SUMO runs with when no --seed is given
+SUMO_DEFAULT_SEED = 23423
+
+
+def _member_args(sumo_args, seed, index) -> list:
+    '''sumo_args of member index, with the seed of the member in place of any --seed'''
+    args = list(sumo_args)
+    if "--seed" in args:
+        at = args.index("--seed")
+        if seed is None:
+            seed = int(args[at + 1])
+        del args[at:at + 2]
+    if seed is None:
+        seed = SUMO_DEFAULT_SEED
+    return args + ["--seed", str(seed + index)]
+
+
+class SumoVectorEnv(AsyncVectorEnv):
+    '''
+    Runs num_envs DemoEnv instances, each driving its own SUMO process through a
+    labelled TraCI connection in a separate worker process. Observations are
+    stacked as (num_envs, obs_dim) float32 in shared memory. step() advances all
+    instances in lockstep, step_async()/step_wait() let the caller overlap
+    policy inference with simulation. With copy=False the returned observations
+    are views onto the shared buffer and are overwritten by the next step.
+    Finished episodes are reset automatically. Member i runs SUMO with seed
+    + i, the base seed taken from seed, a --seed in sumo_args or SUMO's
+    default, so the members do not drive identical traffic.
+    '''
+    def __init__(
+        self, num_envs, num_vehicles, num_agents, route_id, backend=None,
+        warmup_steps=None, sumo_args=("--nogui",), copy=True, context=None,
+        autoreset_mode=AutoresetMode.NEXT_STEP, label_prefix=None, seed=None
+    ):
+        # labels name the connections and the SUMO output files, they must
+        # not collide with those of another vector env
+        if label_prefix is None:
+            label_prefix = f"sumo_{os.getpid()}_{next(_instances)}"
+        env_fns = [
+            partial(
+                DemoEnv,
+                num_vehicles=num_vehicles,
+                num_agents=num_agents,
+                route_id=route_id,
+                backend=backend,
+                warmup_steps=warmup_steps,
+                label=f"{label_prefix}_{i}",
+                sumo_args=_member_args(sumo_args, seed, i),
+                # the worker copies each observation into shared memory
+                copy=False,
+            )
+            for i in range(num_envs)
+        ]
+        super().__init__(
+            env_fns,
+            shared_memory=True,
+            copy=copy,
+            context=context,
+            autoreset_mode=autoreset_mode,
+        )
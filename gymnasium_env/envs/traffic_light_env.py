@@ -0,0 +1,68 @@
+import gymnasium as gym
+from gymnasium import spaces
+import numpy as np
+import os
+import sys
+from dotenv import load_dotenv
+from src.simulation import Simulation
+
+load_dotenv()
+root_path = os.getenv("SUMO_PROJECT_PATH")
+sys.path.append(root_path)
+
+class TrafficLightEnv(gym.Env):
+    '''
+    Controls every traffic light of the network at once: the action picks the
+    phase of each light, the observation stacks one row per light, see
+    TrafficLights. The reward is the mean speed of the background vehicles,
+    as in DemoEnv. Needs a network with traffic lights, e.g. a ScenarioBuilder
+    ring with traffic_lights=True, and a SUMO backend.
+    '''
+    metadata = {"render_modes": []}
+
+    def __init__(
+        self, num_vehicles, route_id, config_file, backend=None, warmup_steps=None,
+        label=None, sumo_args=None, action_repeat=1
+    ):
+        super().__init__()
+        self._action_repeat = action_repeat
+        self._simulation = Simulation(
+            num_vehicles, 0, route_id, backend, warmup_steps, label, action_repeat,
+            profile=False, config_file=config_file
+        )
+        self._simulation.setup_sumo()
+        self._simulation.get_options(sumo_args)
+        self._simulation.start_sumo()
+        self._simulation.simulation_init()
+
+        self._traffic_lights = self._simulation.get_traffic_lights()
+        if self._traffic_lights is None:
+            self._simulation.end_simulation()
+            raise ValueError("the network has no traffic lights")
+
+        shape = self._traffic_lights.get_observation().shape
+        self.observation_space = spaces.Box(low=-np.inf, high=np.inf, shape=shape, dtype=np.float32)
+        self.action_space = spaces.MultiDiscrete(self._traffic_lights.get_num_phases())
+
+    def reset(self, seed=None, options=None) -> tuple[np.ndarray, dict]:
+        super().reset(seed=seed)
+        options = options or {}
+        snapshot = options.get("snapshot")
+        if snapshot is None:
+            snapshot = int(self.np_random.integers(self._simulation.get_num_snapshots()))
+        self._simulation.simulation_reset(snapshot)
+        return self._traffic_lights.get_observation(), {}
+
+    def step(self, action) -> tuple[np.ndarray, float, bool, bool, dict]:
+        self._traffic_lights.set_phases(action)
+        self._simulation.simulation_step()
+
+        if self._action_repeat == 1:
+            reward = self._simulation.get_observation().mean_speed()
+        else:
+            reward = self._simulation.get_interval_speed()
+        terminated = self._simulation.get_terminated()
+        return self._traffic_lights.get_observation(), reward, terminated, False, {}
+
+    def close(self) -> None:
+        self._simulation.end_simulation()
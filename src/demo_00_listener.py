@@ -1,37 +1,184 @@
+import numpy as np
 import traci
 import traci.constants as tc
-from typing import List
+from observation import ObservationBuilder
+from profiling import StepProfiler
+
+# variables subscribed for every vehicle once it has been inserted
+VEHICLE_VARS = (
+    tc.VAR_POSITION,
+    tc.VAR_SPEED,
+    tc.VAR_LANEPOSITION,
+    tc.VAR_ACCELERATION,
+    tc.VAR_DISTANCE,
+    tc.VAR_LANE_ID,
+)
+# mesoscopic vehicles drive on edge segments and report an empty lane
+MESO_VEHICLE_VARS = VEHICLE_VARS[:-1] + (tc.VAR_ROAD_ID,)
+# variables of the vehicles inside an agent's context subscription
+CONTEXT_VARS = (
+    tc.VAR_POSITION,
+    tc.VAR_SPEED,
+    tc.VAR_DISTANCE,
+)
 
 class Listener_00(traci.StepListener):
-    def __init__(self, vehicleIDs, routeID):
+    def __init__(self, vehicleIDs, routeID, sumo=traci, observation=None, profiler=None,
+                 neighbours=None, mesosim=False, subscribe_fleet=True):
         super().__init__()
+        # traci or libsumo, both expose the same domain API
+        self._sumo = sumo
         self._vehicleIDs = vehicleIDs
         self._routeID = routeID
-        self._speeds = [None] * len(vehicleIDs)
-        self._posns = [None] * len(vehicleIDs)
-    
-    def getPosns(self) -> List[tuple]:
-        return self._posns
+        self._index = {id: i for i, id in enumerate(vehicleIDs)}
+
+        # positions and speeds go straight into the observation buffer, the
+        # other variables into preallocated arrays sharing its validity mask
+        n = len(vehicleIDs)
+        self._observation = observation if observation is not None else ObservationBuilder(n)
+        self._lane_posns = np.zeros(n)
+        self._accels = np.zeros(n)
+        self._distances = np.zeros(n)
+        self._lane_ids = [None] * n
+        self._no_lanes = [None] * n
+        self._profiler = profiler if profiler is not None else StepProfiler(enabled=False)
+
+        # agents are the last rows, their surroundings come from context
+        # subscriptions instead of from the whole fleet
+        self._neighbours = neighbours
+        self._first_agent = n - (neighbours.get_neighbours().shape[0] if neighbours is not None else 0)
+        # with neighbours, the background vehicles are only subscribed if
+        # subscribe_fleet, e.g. for gap features; otherwise their rows stay
+        # invalid and the per-step cost only depends on the agents' contexts
+        self._first_subscribed = 0 if neighbours is None or subscribe_fleet else self._first_agent
+        # speeds and odometers of the vehicles in any agent's context, by
+        # vehicle ID
+        self._context_speeds = {}
+        self._context_distances = {}
+
+        # in meso the lane IDs are edge IDs
+        self._vars = MESO_VEHICLE_VARS if mesosim else VEHICLE_VARS
+        self._lane_var = tc.VAR_ROAD_ID if mesosim else tc.VAR_LANE_ID
+
+        # departures are delivered with every simulation step at no extra cost
+        self._sumo.simulation.subscribe((tc.VAR_DEPARTED_VEHICLES_IDS,))
+
+    def getPosns(self) -> np.ndarray:
+        return self._observation.get_posns()
+
+    def getSpeeds(self) -> np.ndarray:
+        return self._observation.get_speeds()
+
+    def getValid(self) -> np.ndarray:
+        return self._observation.get_valid()
+
+    def getLanePosns(self) -> np.ndarray:
+        return self._lane_posns
+
+    def getAccels(self) -> np.ndarray:
+        return self._accels
+
+    def getDistances(self) -> np.ndarray:
+        return self._distances
+
+    def getContextSpeed(self) -> float:
+        '''mean speed of the vehicles in the agents' contexts, agents included'''
+        if not self._context_speeds:
+            return 0.0
+        return float(np.mean(list(self._context_speeds.values())))
 
-    def getSpeeds(self) -> List[float]:
-        return self._speeds
+    def getContextDistances(self) -> dict:
+        '''odometers of the vehicles in the agents' contexts, by vehicle ID'''
+        return self._context_distances
+
+    def getLaneIDs(self) -> list:
+        '''lane IDs, or edge IDs in mesoscopic mode; None where not inserted'''
+        return self._lane_ids
+
+    def _subscribe_departed(self) -> None:
+        departed = self._sumo.simulation.getSubscriptionResults()[tc.VAR_DEPARTED_VEHICLES_IDS]
+        for id in departed:
+            if self._index.get(id, -1) >= self._first_subscribed:
+                self._subscribe(id)
+
+    def _subscribe(self, id) -> None:
+        self._sumo.vehicle.subscribe(id, self._vars)
+        if self._neighbours is not None and self._index[id] >= self._first_agent:
+            self._sumo.vehicle.subscribeContext(
+                id, tc.CMD_GET_VEHICLE_VARIABLE, self._neighbours.get_radius(), CONTEXT_VARS
+            )
+            lanes = self._neighbours.get_lanes()
+            if lanes is not None:
+                radius = self._neighbours.get_radius()
+                self._sumo.vehicle.addSubscriptionFilterLanes(
+                    lanes, noOpposite=True, downstreamDist=radius, upstreamDist=radius
+                )
+
+    def reset(self) -> None:
+        '''re-registers subscriptions, which SUMO drops on loadState'''
+        self._sumo.simulation.subscribe((tc.VAR_DEPARTED_VEHICLES_IDS,))
+        self._clear()
+
+        # the subscription cache still holds pre-load values until the next
+        # step, so only the freshly subscribed vehicles are read back
+        for id in self._sumo.vehicle.getIDList():
+            vehicle_index = self._index.get(id)
+            if vehicle_index is None or vehicle_index < self._first_subscribed:
+                continue
+            self._subscribe(id)
+            self._store(vehicle_index, self._sumo.vehicle.getSubscriptionResults(id))
+            if self._neighbours is not None and vehicle_index >= self._first_agent:
+                # a lane filter only applies from the next step on, until then
+                # the context covers the plain radius; Simulation.load_state
+                # steps once in that case
+                self._store_neighbours(id, self._sumo.vehicle.getContextSubscriptionResults(id))
 
     def step(self, t) -> bool:
-        for id in self._vehicleIDs:
-            vehicle_index = int(id)
-
-            try:
-                pos = traci.vehicle.getPosition(id)
-                self._posns[vehicle_index] = pos
-            except traci.TraCIException:
-                self._posns[vehicle_index] = None
-
-            try:
-                speed = traci.vehicle.getSpeed(id)
-                self._speeds[vehicle_index] = speed
-            except traci.TraCIException:
-                self._speeds[vehicle_index] = None
-                
+        start = self._profiler.now()
+        self._subscribe_departed()
+        self._clear()
+
+        # a single lookup in the client-side cache filled by the step response
+        results = self._sumo.vehicle.getAllSubscriptionResults()
+        for id, values in results.items():
+            vehicle_index = self._index.get(id)
+            if vehicle_index is not None:
+                self._store(vehicle_index, values)
+
+        if self._neighbours is not None:
+            contexts = self._sumo.vehicle.getAllContextSubscriptionResults()
+            for id, neighbours in contexts.items():
+                self._store_neighbours(id, neighbours)
+
+        self._profiler.record("listener", start)
         return True
-    
-       
+
+    def _clear(self) -> None:
+        self._observation.clear()
+        if self._neighbours is not None:
+            self._neighbours.clear()
+            self._context_speeds.clear()
+            self._context_distances.clear()
+        self._lane_posns.fill(0.0)
+        self._accels.fill(0.0)
+        self._distances.fill(0.0)
+        self._lane_ids[:] = self._no_lanes
+
+    def _store(self, vehicle_index, values) -> None:
+        self._observation.write(vehicle_index, values[tc.VAR_POSITION], values[tc.VAR_SPEED])
+        self._lane_posns[vehicle_index] = values[tc.VAR_LANEPOSITION]
+        self._accels[vehicle_index] = values[tc.VAR_ACCELERATION]
+        self._distances[vehicle_index] = values[tc.VAR_DISTANCE]
+        self._lane_ids[vehicle_index] = values[self._lane_var]
+
+    def _store_neighbours(self, id, neighbours) -> None:
+        agent_index = self._index[id] - self._first_agent
+        ego = self._observation.get_agent_rows()[agent_index]
+        # contexts overlap, each vehicle counts once
+        self._context_speeds.update((other, values[tc.VAR_SPEED]) for other, values in neighbours.items())
+        self._context_distances.update((other, values[tc.VAR_DISTANCE]) for other, values in neighbours.items())
+        # the context of a vehicle includes the vehicle itself
+        others = [values for other, values in neighbours.items() if other != id]
+        posns = np.array([values[tc.VAR_POSITION] for values in others]).reshape(-1, 2)
+        speeds = np.array([values[tc.VAR_SPEED] for values in others])
+        self._neighbours.write(agent_index, ego[:2], ego[2], posns, speeds)
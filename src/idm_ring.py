@@ -0,0 +1,615 @@
+import os
+import xml.etree.ElementTree as ET
+import numpy as np
+import sumolib
+import traci.constants as tc
+
+# SUMO defaults for vType attributes missing from the route file
+VTYPE_DEFAULTS = {
+    "length": 5.0,
+    "minGap": 2.5,
+    "accel": 2.6,
+    "decel": 4.5,
+    "maxSpeed": 55.55,
+    "tau": 1.0,
+    "sigma": 0.5,
+}
+DEFAULT_VEHTYPE = "DEFAULT_VEHTYPE"
+IDM_DELTA = 4.0
+# SUMO's random seed when --seed is not given
+DEFAULT_SEED = 23423
+
+
+class IDMRingException(Exception):
+    pass
+
+
+class RingNetwork:
+    '''
+    Step length, vehicle types, routes and ring geometry read from a SUMO
+    configuration. The ring is lane 0 of the route edges joined by their
+    internal lanes, positions are arc lengths along it.
+    '''
+    def __init__(self, config_file):
+        config_dir = os.path.dirname(os.path.abspath(config_file))
+        config = ET.parse(config_file).getroot()
+
+        def config_value(tag, default=None):
+            element = config.find(f".//{tag}")
+            return default if element is None else element.get("value")
+
+        self.dt = float(config_value("step-length", 1.0))
+        net_file = os.path.join(config_dir, config_value("net-file"))
+        route_files = config_value("route-files", "")
+
+        self.vtypes = {DEFAULT_VEHTYPE: dict(VTYPE_DEFAULTS)}
+        self.routes = {}
+        for route_file in route_files.split(","):
+            if not route_file:
+                continue
+            root = ET.parse(os.path.join(config_dir, route_file.strip())).getroot()
+            for vtype in root.iter("vType"):
+                params = dict(VTYPE_DEFAULTS)
+                for key in params:
+                    if vtype.get(key) is not None:
+                        params[key] = float(vtype.get(key))
+                self.vtypes[vtype.get("id")] = params
+            for route in root.iter("route"):
+                self.routes[route.get("id")] = route.get("edges").split()
+
+        self._net = sumolib.net.readNet(net_file, withInternal=True)
+        self.edges = None
+
+    def build(self, route_id) -> None:
+        '''
+        concatenates the first lane of every route edge and the internal lanes
+        joining them, closing the loop from the last edge back to the first
+        '''
+        if route_id not in self.routes:
+            raise IDMRingException(f"route '{route_id}' not known")
+        edges = self.routes[route_id]
+        lanes = self._ring_lanes(edges, 0)
+
+        lane_ids, offsets, speeds = [], [0.0], []
+        xs, ys, arc = [], [], []
+        for lane in lanes:
+            shape = np.asarray(lane.getShape(), dtype=float)
+            seg = np.hypot(*np.diff(shape, axis=0).T)
+            # SUMO stretches positions along the shape to the lane's length
+            scale = lane.getLength() / max(seg.sum(), 1e-9)
+            arc.extend(offsets[-1] + np.concatenate(([0.0], np.cumsum(seg) * scale)))
+            xs.extend(shape[:, 0])
+            ys.extend(shape[:, 1])
+            lane_ids.append(lane.getID())
+            speeds.append(lane.getSpeed())
+            offsets.append(offsets[-1] + lane.getLength())
+
+        self.edges = edges
+        self.lane_ids = lane_ids
+        self.lane_offsets = np.asarray(offsets[:-1])
+        self.length = offsets[-1]
+        self.lane_speed = min(speeds)
+        self._arc, self._xs, self._ys = np.asarray(arc), np.asarray(xs), np.asarray(ys)
+
+    def _ring_lanes(self, edges, index) -> list:
+        '''lane index of every route edge and the internal lanes joining them'''
+        lanes = []
+        for edge_id, next_id in zip(edges, edges[1:] + edges[:1]):
+            edge = self._net.getEdge(edge_id)
+            lanes.append(edge.getLane(index))
+            connections = [
+                c for c in edge.getConnections(self._net.getEdge(next_id))
+                if c.getFromLane().getIndex() == index
+            ]
+            if not connections:
+                raise IDMRingException(f"route edges {edge_id} and {next_id} do not form a ring")
+            via = connections[0].getViaLaneID()
+            if via:
+                lanes.append(self._net.getLane(via))
+        return lanes
+
+    def lane_rings(self, route_id) -> list:
+        '''
+        one closed ring per lane index shared by all route edges, as
+        (lane ids, arc offset of each lane, ring length); the rings differ in
+        length where internal lanes do
+        '''
+        if route_id not in self.routes:
+            raise IDMRingException(f"route '{route_id}' not known")
+        edges = self.routes[route_id]
+        num_lanes = min(self._net.getEdge(edge_id).getLaneNumber() for edge_id in edges)
+
+        rings = []
+        for index in range(num_lanes):
+            lanes = self._ring_lanes(edges, index)
+            lengths = np.array([lane.getLength() for lane in lanes])
+            offsets = np.concatenate(([0.0], np.cumsum(lengths)))
+            rings.append(([lane.getID() for lane in lanes], offsets[:-1], offsets[-1]))
+        return rings
+
+    def edge_ring(self, route_id) -> tuple:
+        '''
+        the route as one ring of edges, for mesoscopic vehicles that report
+        edges instead of lanes; offsets and length follow the first lane
+        ring, so internal lanes still count towards the gaps
+        '''
+        lane_ids, offsets, length = self.lane_rings(route_id)[0]
+        normal = [i for i, lane_id in enumerate(lane_ids) if not lane_id.startswith(":")]
+        edge_ids = [lane_ids[i].rsplit("_", 1)[0] for i in normal]
+        return edge_ids, offsets[normal], length
+
+    def position(self, pos: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        return np.interp(pos, self._arc, self._xs), np.interp(pos, self._arc, self._ys)
+
+    def lane(self, pos: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        '''index into lane_ids and position on that lane'''
+        lane = np.searchsorted(self.lane_offsets, pos, side="right") - 1
+        return lane, pos - self.lane_offsets[lane]
+
+
+def idm_acceleration(v, gap, leader_speed, max_speed, accel, decel, min_gap, tau) -> np.ndarray:
+    '''intelligent driver model, broadcasting over any array shape'''
+    s_star = min_gap + np.maximum(0.0, v * tau + v * (v - leader_speed) / (2 * np.sqrt(accel * decel)))
+    return accel * (1 - (v / max_speed) ** IDM_DELTA - (s_star / np.maximum(gap, 1e-3)) ** 2)
+
+
+class IDMRing:
+    '''
+    In-process stand-in for a TraCI connection on single-lane ring networks such
+    as demo_00. Vehicles follow the intelligent driver model, integrated for all
+    vehicles at once with NumPy, with SUMO's driver imperfection sigma drawn
+    from the --seed of the start command. Only the part of the TraCI API used
+    by Simulation and Listener_00 is implemented.
+    '''
+    def __init__(self, capacity=64):
+        self.vehicle = _VehicleDomain(self)
+        self.simulation = _SimulationDomain(self)
+        self._listeners = []
+        self._capacity = capacity
+
+    def start(self, cmd, label=None) -> None:
+        config_file = cmd[cmd.index("-c") + 1]
+        self._network = RingNetwork(config_file)
+        self._dt = self._network.dt
+        seed = int(cmd[cmd.index("--seed") + 1]) if "--seed" in cmd else DEFAULT_SEED
+        self._rng = np.random.default_rng(seed)
+        self._time = 0.0
+        self._ids = []
+        self._index = {}
+        self._departed = ()
+        self._subscribed = {}
+        self._contexts = {}
+        self._sim_vars = ()
+        self._geometry_time = None
+        self._allocate(self._capacity)
+
+    def close(self, wait=True) -> None:
+        self._listeners = []
+
+    def addStepListener(self, listener) -> int:
+        self._listeners.append(listener)
+        listener.setID(len(self._listeners) - 1)
+        return listener.getID()
+
+    def removeStepListener(self, listenerID) -> bool:
+        self._listeners[listenerID] = None
+        return True
+
+    def simulationStep(self, time=0.0) -> None:
+        # like SUMO, departures accumulate over all steps of one call
+        departed = self._advance()
+        while self._time < time - 1e-9:
+            departed += self._advance()
+        self._departed = departed
+        for listener in self._listeners:
+            if listener is not None:
+                listener.step(time)
+
+    def _allocate(self, capacity, keep=0) -> None:
+        '''(re)allocates the per-vehicle arrays, keeping the first keep rows'''
+        for name, fill, dtype in (
+            ("_pos", 0.0, float), ("_speed", 0.0, float), ("_accel", 0.0, float),
+            ("_length", 0.0, float), ("_min_gap", 0.0, float), ("_max_accel", 0.0, float),
+            ("_decel", 0.0, float), ("_max_speed", 0.0, float), ("_tau", 0.0, float), ("_sigma", 0.0, float),
+            ("_forced_accel", np.nan, float), ("_forced_until", -np.inf, float),
+            ("_distance", 0.0, float), ("_running", False, bool),
+        ):
+            array = np.full(capacity, fill, dtype=dtype)
+            if keep:
+                array[:keep] = getattr(self, name)[:keep]
+            setattr(self, name, array)
+        self._capacity = capacity
+
+    def _add(self, vehID, routeID, typeID) -> None:
+        if vehID in self._index:
+            raise IDMRingException(f"vehicle '{vehID}' already exists")
+        network = self._network
+        if typeID not in network.vtypes:
+            raise IDMRingException(f"vehicle type '{typeID}' not known")
+        if network.edges is None:
+            network.build(routeID)
+        elif network.routes.get(routeID) != network.edges:
+            raise IDMRingException("all vehicles must share the ring route")
+
+        n = len(self._ids)
+        if n == self._capacity:
+            self._allocate(2 * self._capacity, keep=n)
+
+        params = network.vtypes[typeID]
+        self._length[n] = params["length"]
+        self._min_gap[n] = params["minGap"]
+        self._max_accel[n] = params["accel"]
+        self._decel[n] = params["decel"]
+        self._max_speed[n] = min(params["maxSpeed"], network.lane_speed)
+        self._tau[n] = params["tau"]
+        self._sigma[n] = params["sigma"]
+        self._ids.append(vehID)
+        self._index[vehID] = n
+        self._geometry_time = None
+
+    def _gaps(self, n):
+        '''bumper-to-bumper gap and leader speed for every running vehicle'''
+        order = np.flatnonzero(self._running[:n])
+        order = order[np.argsort(self._pos[order], kind="stable")]
+        leaders = np.roll(order, -1)
+        gaps = np.full(n, np.inf)
+        leader_speed = np.zeros(n)
+        length = self._network.length
+        gaps[order] = (self._pos[leaders] - self._pos[order]) % length - self._length[leaders]
+        if len(order) == 1:
+            gaps[order] = length - self._length[order]
+        leader_speed[order] = self._speed[leaders]
+        return gaps, leader_speed
+
+    def _advance(self) -> tuple:
+        n = len(self._ids)
+        running = self._running[:n]
+        v = self._speed[:n]
+        gaps, leader_speed = self._gaps(n)
+
+        v0 = self._max_speed[:n]
+        accel = idm_acceleration(
+            v, gaps, leader_speed, v0, self._max_accel[:n], self._decel[:n],
+            self._min_gap[:n], self._tau[:n]
+        )
+
+        forced = self._forced_until[:n] > self._time
+        accel = np.where(forced, self._forced_accel[:n], accel)
+
+        # euler update as in SUMO, never driving into the leader
+        new_v = np.clip(v + accel * self._dt, 0.0, v0)
+        # dawdling as in SUMO's Krauss model, not while an acceleration is forced
+        dawdle = self._sigma[:n] * self._max_accel[:n] * self._dt * self._rng.random(n)
+        new_v = np.where(forced, new_v, np.maximum(new_v - dawdle, 0.0))
+        new_v = np.where(running, np.minimum(new_v, np.maximum(gaps, 0.0) / self._dt), 0.0)
+        self._accel[:n] = np.where(running, (new_v - v) / self._dt, 0.0)
+        self._speed[:n] = new_v
+        self._distance[:n] += new_v * self._dt
+        self._pos[:n] = np.where(running, (self._pos[:n] + new_v * self._dt) % self._network.length, 0.0)
+
+        departed = self._insert(n)
+        self._time += self._dt
+        return departed
+
+    def _insert(self, n) -> tuple:
+        '''inserts waiting vehicles at the start of the route while there is room'''
+        departed = []
+        for i in np.flatnonzero(~self._running[:n]):
+            occupied = self._running[:n]
+            ahead = self._pos[:n][occupied] - self._length[:n][occupied]
+            behind = self._network.length - self._pos[:n][occupied]
+            if np.any(ahead < self._min_gap[i]) or np.any(behind < self._length[i] + self._min_gap[:n][occupied]):
+                break
+            self._running[i] = True
+            self._pos[i] = 0.0
+            self._speed[i] = 0.0
+            self._distance[i] = 0.0
+            departed.append(self._ids[i])
+        return tuple(departed)
+
+    def _check(self, vehID, running=True) -> int:
+        i = self._index.get(vehID)
+        if i is None or (running and not self._running[i]):
+            raise IDMRingException(f"vehicle '{vehID}' is not known")
+        return i
+
+    def _geometry(self) -> None:
+        '''positions and lanes of all vehicles, computed once per step on demand'''
+        if self._geometry_time == self._time:
+            return
+        n = len(self._ids)
+        pos = self._pos[:n]
+        self._x, self._y = self._network.position(pos)
+        self._lane, self._lane_position = self._network.lane(pos)
+        self._geometry_time = self._time
+
+    def _values(self, i, varIDs) -> dict:
+        self._geometry()
+        values = {}
+        for var in varIDs:
+            if var == tc.VAR_POSITION:
+                values[var] = (float(self._x[i]), float(self._y[i]))
+            elif var == tc.VAR_SPEED:
+                values[var] = float(self._speed[i])
+            elif var == tc.VAR_LANEPOSITION:
+                values[var] = float(self._lane_position[i])
+            elif var == tc.VAR_ACCELERATION:
+                values[var] = float(self._accel[i])
+            elif var == tc.VAR_DISTANCE:
+                values[var] = float(self._distance[i])
+            elif var == tc.VAR_LANE_ID:
+                values[var] = self._network.lane_ids[self._lane[i]]
+            else:
+                raise IDMRingException(f"variable 0x{var:02x} not supported")
+        return values
+
+    def _context(self, i, radius, varIDs, filter) -> dict:
+        '''running vehicles within radius of vehicle i, including itself'''
+        self._geometry()
+        n = len(self._ids)
+        running = self._running[:n]
+        if filter is not None:
+            # lane filter on a single-lane ring: only offset 0 exists and the
+            # range is measured along the ring
+            lanes, downstream, upstream = filter
+            if 0 not in lanes:
+                return {self._ids[i]: self._values(i, varIDs)}
+            ahead = (self._pos[:n] - self._pos[i]) % self._network.length
+            inside = running & ((ahead <= downstream) | (self._network.length - ahead <= upstream))
+        else:
+            dx = self._x - self._x[i]
+            dy = self._y - self._y[i]
+            inside = running & (dx * dx + dy * dy <= radius * radius)
+        inside[i] = True
+        return {self._ids[j]: self._values(j, varIDs) for j in np.flatnonzero(inside)}
+
+    def _save(self, fileName) -> None:
+        n = len(self._ids)
+        with open(fileName, "wb") as f:
+            np.savez(
+                f, time=self._time, ids=np.array(self._ids, dtype=object),
+                running=self._running[:n], pos=self._pos[:n], speed=self._speed[:n],
+                accel=self._accel[:n], forced_accel=self._forced_accel[:n],
+                forced_until=self._forced_until[:n], distance=self._distance[:n],
+            )
+
+    def _load(self, fileName) -> None:
+        with open(fileName, "rb") as f:
+            state = np.load(f, allow_pickle=True)
+            if list(state["ids"]) != self._ids[:len(state["ids"])]:
+                raise IDMRingException("state file does not match the loaded vehicles")
+            n = len(state["ids"])
+            self._running[:] = False
+            self._running[:n] = state["running"]
+            self._pos[:n] = state["pos"]
+            self._speed[:n] = state["speed"]
+            self._accel[:n] = state["accel"]
+            self._forced_accel[:n] = state["forced_accel"]
+            self._forced_until[:n] = state["forced_until"]
+            self._distance[:n] = state["distance"]
+            self._time = float(state["time"])
+        # vehicles added after the snapshot are dropped, as in SUMO
+        for id in self._ids[n:]:
+            del self._index[id]
+        del self._ids[n:]
+        self._departed = ()
+        self._subscribed = {}
+        self._contexts = {}
+        self._sim_vars = ()
+        self._geometry_time = None
+
+
+class _VehicleDomain:
+    def __init__(self, ring: IDMRing):
+        self._ring = ring
+
+    def add(self, vehID, routeID, typeID=DEFAULT_VEHTYPE, **kwargs) -> None:
+        self._ring._add(vehID, routeID, typeID)
+
+    def getIDList(self) -> tuple:
+        ring = self._ring
+        return tuple(ring._ids[i] for i in np.flatnonzero(ring._running[:len(ring._ids)]))
+
+    def getPosition(self, vehID) -> tuple:
+        return self._ring._values(self._ring._check(vehID), (tc.VAR_POSITION,))[tc.VAR_POSITION]
+
+    def getSpeed(self, vehID) -> float:
+        return float(self._ring._speed[self._ring._check(vehID)])
+
+    def getAcceleration(self, vehID) -> float:
+        return float(self._ring._accel[self._ring._check(vehID)])
+
+    def getDistance(self, vehID) -> float:
+        return float(self._ring._distance[self._ring._check(vehID)])
+
+    def getLanePosition(self, vehID) -> float:
+        i = self._ring._check(vehID)
+        return self._ring._values(i, (tc.VAR_LANEPOSITION,))[tc.VAR_LANEPOSITION]
+
+    def getLaneID(self, vehID) -> str:
+        return self._ring._values(self._ring._check(vehID), (tc.VAR_LANE_ID,))[tc.VAR_LANE_ID]
+
+    def setAcceleration(self, vehID, acceleration, duration=None) -> None:
+        ring = self._ring
+        # accepted before insertion, as in SUMO
+        i = ring._check(vehID, running=False)
+        ring._forced_accel[i] = acceleration
+        ring._forced_until[i] = ring._time + (ring._dt if duration is None else max(duration, ring._dt))
+
+    def subscribe(self, objectID, varIDs=(tc.VAR_ROAD_ID, tc.VAR_LANEPOSITION), **kwargs) -> None:
+        ring = self._ring
+        if objectID not in ring._index:
+            raise IDMRingException(f"vehicle '{objectID}' is not known")
+        ring._subscribed[objectID] = tuple(varIDs)
+
+    def getSubscriptionResults(self, objectID) -> dict:
+        ring = self._ring
+        i = ring._index.get(objectID)
+        if i is None or not ring._running[i] or objectID not in ring._subscribed:
+            return {}
+        return ring._values(i, ring._subscribed[objectID])
+
+    def getAllSubscriptionResults(self) -> dict:
+        ring = self._ring
+        results = {}
+        for id, varIDs in ring._subscribed.items():
+            i = ring._index[id]
+            if ring._running[i]:
+                results[id] = ring._values(i, varIDs)
+        return results
+
+    def subscribeContext(self, objectID, domain, dist, varIDs=(tc.VAR_ROAD_ID, tc.VAR_LANEPOSITION), **kwargs) -> None:
+        ring = self._ring
+        if objectID not in ring._index:
+            raise IDMRingException(f"vehicle '{objectID}' is not known")
+        if domain != tc.CMD_GET_VEHICLE_VARIABLE:
+            raise IDMRingException(f"context domain 0x{domain:02x} not supported")
+        # re-inserted, so the most recent subscription is always the last one
+        ring._contexts.pop(objectID, None)
+        ring._contexts[objectID] = [dist, tuple(varIDs), None]
+
+    def addSubscriptionFilterLanes(self, lanes, noOpposite=False, downstreamDist=None, upstreamDist=None) -> None:
+        # as in TraCI, the filter applies to the most recent context subscription
+        ring = self._ring
+        if not ring._contexts:
+            raise IDMRingException("no context subscription to filter")
+        context = next(reversed(ring._contexts.values()))
+        downstream = context[0] if downstreamDist is None else downstreamDist
+        upstream = context[0] if upstreamDist is None else upstreamDist
+        context[2] = (tuple(lanes), downstream, upstream)
+
+    def getContextSubscriptionResults(self, objectID) -> dict:
+        ring = self._ring
+        i = ring._index.get(objectID)
+        if i is None or not ring._running[i] or objectID not in ring._contexts:
+            return {}
+        return ring._context(i, *ring._contexts[objectID])
+
+    def getAllContextSubscriptionResults(self) -> dict:
+        ring = self._ring
+        results = {}
+        for id, context in ring._contexts.items():
+            i = ring._index[id]
+            if ring._running[i]:
+                results[id] = ring._context(i, *context)
+        return results
+
+
+class _SimulationDomain:
+    def __init__(self, ring: IDMRing):
+        self._ring = ring
+
+    def step(self, time=0.0) -> None:
+        self._ring.simulationStep(time)
+
+    def getTime(self) -> float:
+        return self._ring._time
+
+    def getDeltaT(self) -> float:
+        return self._ring._dt
+
+    def getMinExpectedNumber(self) -> int:
+        # the rerouters keep every vehicle on the ring, nobody arrives
+        return len(self._ring._ids)
+
+    def getDepartedIDList(self) -> tuple:
+        return self._ring._departed
+
+    def subscribe(self, varIDs=(tc.VAR_DEPARTED_VEHICLES_IDS,), **kwargs) -> None:
+        self._ring._sim_vars = tuple(varIDs)
+
+    def getSubscriptionResults(self, objectID=None) -> dict:
+        results = {}
+        for var in self._ring._sim_vars:
+            if var == tc.VAR_DEPARTED_VEHICLES_IDS:
+                results[var] = self._ring._departed
+            else:
+                raise IDMRingException(f"variable 0x{var:02x} not supported")
+        return results
+
+    def saveState(self, fileName) -> None:
+        self._ring._save(fileName)
+
+    def loadState(self, fileName) -> None:
+        self._ring._load(fileName)
+
+
+class BatchedIDMRing:
+    '''
+    num_envs independent copies of a ring, held as (num_envs, num_vehicles)
+    arrays and advanced together with one NumPy update per step. The last
+    num_agents columns are controlled through step(), all others follow IDM.
+    Vehicles never overtake on a single lane, so every vehicle keeps the leader
+    it was given at reset.
+    '''
+    def __init__(self, config_file, route_id, num_envs, num_vehicles, num_agents, vtype="car"):
+        self.network = RingNetwork(config_file)
+        self.network.build(route_id)
+        if vtype not in self.network.vtypes:
+            raise IDMRingException(f"vehicle type '{vtype}' not known")
+        params = self.network.vtypes[vtype]
+
+        self.num_envs = num_envs
+        self.num_vehicles = num_vehicles
+        self.num_agents = num_agents
+        self.dt = self.network.dt
+        n = num_vehicles + num_agents
+
+        self._length = params["length"]
+        self._min_gap = params["minGap"]
+        self._accel = params["accel"]
+        self._decel = params["decel"]
+        self._tau = params["tau"]
+        self._max_speed = min(params["maxSpeed"], self.network.lane_speed)
+        if n * (self._length + self._min_gap) > self.network.length:
+            raise IDMRingException(f"{n} vehicles do not fit on a {self.network.length:.1f}m ring")
+
+        self.pos = np.zeros((num_envs, n))
+        self.speed = np.zeros((num_envs, n))
+        self._leader = np.zeros((num_envs, n), dtype=np.intp)
+
+    def reset(self, mask: np.ndarray, rng: np.random.Generator) -> None:
+        '''
+        spreads the vehicles of the selected envs around the ring at rest, in
+        random order and with jittered spacing
+        '''
+        envs = np.flatnonzero(mask)
+        if len(envs) == 0:
+            return
+        n = self.pos.shape[1]
+        spacing = self.network.length / n
+        slack = spacing - self._length - self._min_gap
+
+        slots = rng.permuted(np.tile(np.arange(n), (len(envs), 1)), axis=1)
+        offset = rng.uniform(0.0, self.network.length, size=(len(envs), 1))
+        jitter = rng.uniform(0.0, slack, size=(len(envs), n))
+        self.pos[envs] = (slots * spacing + jitter + offset) % self.network.length
+        self.speed[envs] = 0.0
+
+        # the vehicle in the next slot is the leader
+        by_slot = np.argsort(slots, axis=1)
+        self._leader[envs] = np.take_along_axis(by_slot, (slots + 1) % n, axis=1)
+
+    def step(self, agent_accel: np.ndarray) -> None:
+        '''agent_accel: (num_envs, num_agents) accelerations in m/s^2'''
+        lead_pos = np.take_along_axis(self.pos, self._leader, axis=1)
+        lead_speed = np.take_along_axis(self.speed, self._leader, axis=1)
+        if self.pos.shape[1] == 1:
+            gap = np.full_like(self.pos, self.network.length - self._length)
+        else:
+            gap = (lead_pos - self.pos) % self.network.length - self._length
+
+        accel = idm_acceleration(
+            self.speed, gap, lead_speed, self._max_speed, self._accel, self._decel,
+            self._min_gap, self._tau
+        )
+        if self.num_agents:
+            accel[:, self.num_vehicles:] = agent_accel
+
+        speed = np.clip(self.speed + accel * self.dt, 0.0, self._max_speed)
+        np.minimum(speed, np.maximum(gap, 0.0) / self.dt, out=self.speed)
+        self.pos += self.speed * self.dt
+        np.mod(self.pos, self.network.length, out=self.pos)
+
+    def positions(self) -> tuple[np.ndarray, np.ndarray]:
+        return self.network.position(self.pos)
@@ -0,0 +1,89 @@
+import numpy as np
+
+# columns of the gap features
+LEADER_GAP, LEADER_SPEED, FOLLOWER_GAP, FOLLOWER_SPEED = range(4)
+
+
+class LaneGaps:
+    '''
+    Leader and follower gaps for the whole fleet from the subscribed lane IDs
+    and lane positions, without a getLeader round-trip per vehicle. Every lane
+    index of the route forms its own closed ring (see RingNetwork.lane_rings),
+    vehicles are placed at their arc position on it and sorted once per step;
+    the leader is the next vehicle on the same ring, wrapping around from the
+    last route edge to the first.
+
+    Features per vehicle: bumper-to-bumper gap to the leader, leader speed
+    minus own speed, gap to the follower, follower speed minus own speed. A
+    vehicle alone on its ring follows itself. Gaps are clamped at zero.
+    Vehicles outside the network or off the ring lanes get zero rows.
+    '''
+    def __init__(self, rings, vehicle_lengths: np.ndarray):
+        lane_ring = {}
+        lane_offset = {}
+        for ring, (lane_ids, offsets, _) in enumerate(rings):
+            for lane_id, offset in zip(lane_ids, offsets):
+                lane_ring[lane_id] = ring
+                lane_offset[lane_id] = offset
+        # sorted lane IDs with their ring and arc offset, looked up for the
+        # whole fleet at once with searchsorted
+        self._lanes = np.array(sorted(lane_ring), dtype=str)
+        self._lane_ring = np.array([lane_ring[id] for id in self._lanes], dtype=np.int64)
+        self._lane_offset = np.array([lane_offset[id] for id in self._lanes], dtype=float)
+        self._ring_lengths = np.array([length for _, _, length in rings])
+        self._lengths = np.asarray(vehicle_lengths, dtype=float)
+
+        n = len(self._lengths)
+        self._ring = np.full(n, -1, dtype=np.int64)
+        self._arc = np.zeros(n)
+        self._features = np.zeros((n, 4), dtype=np.float32)
+
+    def update(self, lane_ids, lane_posns: np.ndarray, speeds: np.ndarray) -> np.ndarray:
+        '''lane_ids holds None for vehicles outside the network'''
+        # None becomes 'None', which matches no lane
+        ids = np.asarray(lane_ids, dtype=str)
+        index = np.minimum(np.searchsorted(self._lanes, ids), len(self._lanes) - 1)
+        known = self._lanes[index] == ids
+        np.copyto(self._ring, np.where(known, self._lane_ring[index], -1))
+        np.copyto(self._arc, np.where(known, self._lane_offset[index] + lane_posns, 0.0))
+
+        self._features.fill(0.0)
+        on_ring = np.flatnonzero(self._ring >= 0)
+        if len(on_ring) == 0:
+            return self._features
+
+        # group by ring, then by arc position within each ring
+        order = on_ring[np.lexsort((self._arc[on_ring], self._ring[on_ring]))]
+        ring = self._ring[order]
+        starts = np.flatnonzero(np.r_[True, ring[1:] != ring[:-1]])
+        ends = np.r_[starts[1:], len(order)] - 1
+
+        ahead = np.arange(1, len(order) + 1)
+        ahead[ends] = starts
+        behind = np.arange(-1, len(order) - 1)
+        behind[starts] = ends
+        leaders = order[ahead]
+        followers = order[behind]
+
+        length = self._ring_lengths[ring]
+        arc = self._arc
+        leader_gap = (arc[leaders] - arc[order]) % length - self._lengths[leaders]
+        follower_gap = (arc[order] - arc[followers]) % length - self._lengths[order]
+        # alone on the ring: the gap is the rest of the ring
+        alone = leaders == order
+        leader_gap[alone] = length[alone] - self._lengths[order][alone]
+        follower_gap[alone] = leader_gap[alone]
+        # meso positions inside a segment are approximate, vehicles queued in
+        # one segment can overlap and would report negative gaps
+        np.maximum(leader_gap, 0.0, out=leader_gap)
+        np.maximum(follower_gap, 0.0, out=follower_gap)
+
+        features = self._features
+        features[order, LEADER_GAP] = leader_gap
+        features[order, LEADER_SPEED] = speeds[leaders] - speeds[order]
+        features[order, FOLLOWER_GAP] = follower_gap
+        features[order, FOLLOWER_SPEED] = speeds[followers] - speeds[order]
+        return features
+
+    def get_features(self) -> np.ndarray:
+        return self._features
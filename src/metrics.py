@@ -0,0 +1,254 @@
+import os
+import abc
+import json
+import xml.etree.ElementTree as ET
+import numpy as np
+from typing import List
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+TRIPINFO_COLUMNS = (
+    "depart",
+    "arrival",
+    "duration",
+    "routeLength",
+    "waitingTime",
+    "timeLoss",
+)
+
+
+class ColumnWriter:
+    '''
+    Appends float64 row chunks to disk, either as row groups of a Parquet file
+    (needs pyarrow) or as one .npy file per chunk in a directory, which can be
+    memory-mapped back with np.load(..., mmap_mode="r").
+    '''
+    def __init__(self, path, columns):
+        self._path = path
+        self._columns = list(columns)
+        self._chunks = 0
+        self._writer = None
+
+        if path.endswith(".parquet"):
+            if pa is None:
+                raise ImportError("writing Parquet requires pyarrow")
+            schema = pa.schema([(c, pa.float64()) for c in self._columns])
+            self._writer = pq.ParquetWriter(path, schema)
+        else:
+            os.makedirs(path, exist_ok=True)
+
+    def write(self, rows: np.ndarray) -> None:
+        if len(rows) == 0:
+            return
+        if self._writer is not None:
+            table = pa.table({c: rows[:, i] for i, c in enumerate(self._columns)})
+            self._writer.write_table(table)
+        else:
+            np.save(os.path.join(self._path, f"chunk_{self._chunks:05d}.npy"), rows)
+        self._chunks += 1
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+class _XMLStream(abc.ABC):
+    '''
+    Incremental reader for SUMO XML output. poll() parses whatever has been
+    appended to the file since the previous call, so the same reader works on
+    a file SUMO is still writing during an episode and on a finished one.
+    Every handled element is cleared right away, memory does not grow with
+    the size of the file.
+    '''
+    def __init__(self, path, tag, block_size=1 << 20):
+        self._path = path
+        self._tag = tag
+        self._block_size = block_size
+        self._parser = ET.XMLPullParser(events=("start", "end"))
+        self._offset = 0
+        self._root = None
+
+    def poll(self) -> int:
+        '''parses newly written data, returns the number of elements handled'''
+        if not os.path.exists(self._path):
+            return 0
+
+        handled = 0
+        with open(self._path, "rb") as f:
+            f.seek(self._offset)
+            while True:
+                data = f.read(self._block_size)
+                if not data:
+                    break
+                self._offset += len(data)
+                self._parser.feed(data)
+                handled += self._drain()
+        return handled
+
+    def read(self):
+        '''parses the whole (finished) file'''
+        self.poll()
+        return self
+
+    def _drain(self) -> int:
+        handled = 0
+        for event, elem in self._parser.read_events():
+            if event == "start":
+                if self._root is None:
+                    self._root = elem
+            elif elem.tag == self._tag:
+                self._handle(elem)
+                elem.clear()
+                # drop the cleared elements the root still references
+                self._root.clear()
+                handled += 1
+        return handled
+
+    @abc.abstractmethod
+    def _handle(self, elem) -> None:
+        '''consumes one complete element of the stream's tag'''
+
+
+class TripinfoStream(_XMLStream):
+    '''
+    Streams <tripinfo> elements into fixed-size float64 chunks. Full chunks
+    update running statistics per column and are passed on to an optional
+    ColumnWriter, so per-trip rows never accumulate in memory.
+    '''
+    def __init__(self, path, writer: ColumnWriter = None, chunk_size=4096, columns=TRIPINFO_COLUMNS):
+        super().__init__(path, "tripinfo")
+        self._columns = tuple(columns)
+        self._writer = writer
+        self._chunk = np.empty((chunk_size, len(self._columns)))
+        self._rows = 0
+
+        k = len(self._columns)
+        self._count = np.zeros(k, dtype=np.int64)
+        self._sum = np.zeros(k)
+        self._sumsq = np.zeros(k)
+        self._min = np.full(k, np.inf)
+        self._max = np.full(k, -np.inf)
+
+    def _handle(self, elem) -> None:
+        row = self._chunk[self._rows]
+        for i, column in enumerate(self._columns):
+            value = elem.get(column)
+            row[i] = np.nan if value is None else float(value)
+        self._rows += 1
+        if self._rows == len(self._chunk):
+            self.flush()
+
+    def flush(self) -> None:
+        rows = self._chunk[:self._rows]
+        if len(rows):
+            valid = ~np.isnan(rows)
+            values = np.where(valid, rows, 0.0)
+            self._count += valid.sum(axis=0)
+            self._sum += values.sum(axis=0)
+            self._sumsq += (values ** 2).sum(axis=0)
+            self._min = np.fmin(self._min, np.where(valid, rows, np.inf).min(axis=0))
+            self._max = np.fmax(self._max, np.where(valid, rows, -np.inf).max(axis=0))
+            if self._writer is not None:
+                self._writer.write(rows)
+        self._rows = 0
+
+    def summary(self) -> dict:
+        '''one entry per statistic, each an array over the columns'''
+        self.flush()
+        count = np.maximum(self._count, 1)
+        mean = self._sum / count
+        std = np.sqrt(np.maximum(self._sumsq / count - mean ** 2, 0.0))
+        empty = self._count == 0
+        return {
+            "column": np.array(self._columns),
+            "count": self._count.copy(),
+            "mean": np.where(empty, np.nan, mean),
+            "std": np.where(empty, np.nan, std),
+            "min": np.where(empty, np.nan, self._min),
+            "max": np.where(empty, np.nan, self._max),
+        }
+
+
+class FCDStream(_XMLStream):
+    '''
+    Streams <timestep> elements of floating car data into per-edge speed
+    histograms with fixed bins. Memory depends on the number of edges, not on
+    the length of the output.
+    '''
+    def __init__(self, path, max_speed=20.0, num_bins=20, include_internal=False):
+        super().__init__(path, "timestep")
+        self._bin_edges = np.linspace(0.0, max_speed, num_bins + 1)
+        self._include_internal = include_internal
+        self._edges: List[str] = []
+        self._edge_index = {}
+        self._counts = np.zeros((16, num_bins), dtype=np.int64)
+        self._speed_sum = np.zeros(16)
+
+    def _handle(self, elem) -> None:
+        edges, speeds = [], []
+        for vehicle in elem:
+            lane = vehicle.get("lane")
+            if lane is None or (lane.startswith(":") and not self._include_internal):
+                continue
+            edges.append(self._row(lane.rsplit("_", 1)[0]))
+            speeds.append(float(vehicle.get("speed")))
+        if not edges:
+            return
+
+        edges = np.asarray(edges)
+        speeds = np.asarray(speeds)
+        bins = np.clip(np.digitize(speeds, self._bin_edges) - 1, 0, self._counts.shape[1] - 1)
+        np.add.at(self._counts, (edges, bins), 1)
+        np.add.at(self._speed_sum, edges, speeds)
+
+    def _row(self, edge) -> int:
+        row = self._edge_index.get(edge)
+        if row is None:
+            row = len(self._edges)
+            self._edge_index[edge] = row
+            self._edges.append(edge)
+            if row == len(self._counts):
+                self._counts = np.concatenate((self._counts, np.zeros_like(self._counts)))
+                self._speed_sum = np.concatenate((self._speed_sum, np.zeros_like(self._speed_sum)))
+        return row
+
+    def summary(self) -> dict:
+        '''one row per edge, histogram counts as an (edges, bins) array'''
+        n = len(self._edges)
+        counts = self._counts[:n].copy()
+        samples = counts.sum(axis=1)
+        return {
+            "edge": np.array(self._edges),
+            "samples": samples,
+            "mean_speed": self._speed_sum[:n] / np.maximum(samples, 1),
+            "counts": counts,
+            "bin_edges": self._bin_edges.copy(),
+        }
+
+
+def save_summary(summary: dict, path) -> None:
+    '''writes a summary dict as .npz, or as .parquet with one row per entry'''
+    if not path.endswith(".parquet"):
+        np.savez(path, **summary)
+        return
+    if pa is None:
+        raise ImportError("writing Parquet requires pyarrow")
+
+    rows = len(next(iter(summary.values())))
+    columns, metadata = {}, {}
+    for key, value in summary.items():
+        value = np.asarray(value)
+        if len(value) != rows:
+            # e.g. histogram bin edges, kept as file metadata
+            metadata[key] = json.dumps(value.tolist())
+        elif value.ndim == 2:
+            columns[key] = pa.FixedSizeListArray.from_arrays(pa.array(value.ravel()), value.shape[1])
+        else:
+            columns[key] = pa.array(value.tolist())
+    table = pa.table(columns).replace_schema_metadata(metadata)
+    pq.write_table(table, path)
@@ -0,0 +1,125 @@
+import numpy as np
+
+class ObservationBuilder:
+    '''
+    (x, y, speed) for each vehicle in one persistent float32 buffer that the
+    listener fills in place. The first num_vehicles rows hold the background
+    vehicles, the remaining num_agents rows the agents. Rows of vehicles
+    outside the network are zero and flagged invalid.
+    '''
+    def __init__(self, num_vehicles, num_agents=0):
+        self._num_vehicles = num_vehicles
+        self._buffer = np.zeros((num_vehicles + num_agents, 3), dtype=np.float32)
+        self._valid = np.zeros(num_vehicles + num_agents, dtype=bool)
+        self._posns = self._buffer[:, :2]
+        self._speeds = self._buffer[:, 2]
+
+        # views onto the background vehicle and agent rows
+        self._flat = self._buffer[:num_vehicles].reshape(-1)
+        self._agents = self._buffer[num_vehicles:]
+
+    def clear(self) -> None:
+        self._buffer.fill(0.0)
+        self._valid.fill(False)
+
+    def write(self, index, posn, speed) -> None:
+        self._posns[index] = posn
+        self._speeds[index] = speed
+        self._valid[index] = True
+
+    def get_observation(self) -> np.ndarray:
+        # flat view of the vehicle rows, overwritten in place by the next step
+        return self._flat
+
+    def get_agent_rows(self) -> np.ndarray:
+        return self._agents
+
+    def get_posns(self) -> np.ndarray:
+        return self._posns[:self._num_vehicles]
+
+    def get_speeds(self) -> np.ndarray:
+        return self._speeds[:self._num_vehicles]
+
+    def get_valid(self) -> np.ndarray:
+        return self._valid[:self._num_vehicles]
+
+    def get_agent_valid(self) -> np.ndarray:
+        return self._valid[self._num_vehicles:]
+
+    def get_fleet_rows(self) -> np.ndarray:
+        # (x, y, speed) of vehicles followed by agents
+        return self._buffer
+
+    def get_fleet_valid(self) -> np.ndarray:
+        return self._valid
+
+    def get_fleet_speeds(self) -> np.ndarray:
+        return self._speeds
+
+    def mean_speed(self) -> float:
+        count = np.count_nonzero(self.get_valid())
+        if count == 0:
+            return 0.0
+        # invalid rows are zero, so the plain sum only covers valid vehicles
+        return float(self.get_speeds().sum(dtype=np.float64) / count)
+
+
+class NeighbourObservation:
+    '''
+    The agent's own speed followed by the num_neighbours vehicles closest to
+    it, read from context subscriptions around the agents, as (dx, dy, dv)
+    relative to the agent and sorted by distance. Rows of missing neighbours
+    are zero and flagged invalid, as is everything of an agent outside the
+    network. The per-step cost depends on the local density only.
+    '''
+    def __init__(self, num_agents, num_neighbours, radius, lanes=None):
+        self._num_neighbours = num_neighbours
+        self._radius = radius
+        # lane offsets around the agent's lane, None for the plain radius
+        self._lanes = lanes
+        # one row per agent: speed, then the neighbours' (dx, dy, dv)
+        self._rows = np.zeros((num_agents, 1 + num_neighbours * 3), dtype=np.float32)
+        self._speeds = self._rows[:, 0]
+        self._buffer = self._rows[:, 1:].reshape(num_agents, num_neighbours, 3)
+        self._valid = np.zeros((num_agents, num_neighbours), dtype=bool)
+        self._flat = self._rows.reshape(-1)
+
+    def clear(self) -> None:
+        self._rows.fill(0.0)
+        self._valid.fill(False)
+
+    def write(self, agent_index, posn, speed, posns: np.ndarray, speeds: np.ndarray) -> None:
+        '''posns (m, 2) and speeds (m,) of the vehicles around the agent'''
+        self._speeds[agent_index] = speed
+        if len(speeds) == 0:
+            return
+        offsets = posns - posn
+        distances = np.einsum("ij,ij->i", offsets, offsets)
+        k = min(self._num_neighbours, len(distances))
+        nearest = np.argpartition(distances, k - 1)[:k] if k < len(distances) else np.arange(k)
+        nearest = nearest[np.argsort(distances[nearest], kind="stable")]
+
+        rows = self._buffer[agent_index]
+        rows[:k, :2] = offsets[nearest]
+        rows[:k, 2] = speeds[nearest] - speed
+        self._valid[agent_index, :k] = True
+
+    def get_observation(self) -> np.ndarray:
+        # flat view, overwritten in place by the next step
+        return self._flat
+
+    def get_neighbours(self) -> np.ndarray:
+        '''(num_agents, num_neighbours, 3) view of the neighbour rows'''
+        return self._buffer
+
+    def get_speeds(self) -> np.ndarray:
+        return self._speeds
+
+    def get_valid(self) -> np.ndarray:
+        return self._valid
+
+    def get_radius(self) -> float:
+        return self._radius
+
+    def get_lanes(self):
+        return self._lanes
@@ -0,0 +1,92 @@
+import time
+import numpy as np
+
+# log2 buckets of nanoseconds, the last one collects everything above ~1 s
+NUM_BUCKETS = 32
+
+
+class StepProfiler:
+    '''
+    Per-phase wall clock timing with monotonic nanosecond counters. Each phase
+    keeps the last `window` durations in a ring buffer, summary() turns them
+    into rolling percentiles and a log2 histogram. Nothing is logged per step.
+    When disabled every call returns immediately.
+    '''
+    def __init__(self, enabled=True, window=1024):
+        self._enabled = enabled
+        self._window = window
+        self._samples = {}
+        self._counts = {}
+        self._totals = {}
+        self._last = {}
+
+    def enabled(self) -> bool:
+        return self._enabled
+
+    def now(self) -> int:
+        if not self._enabled:
+            return 0
+        return time.perf_counter_ns()
+
+    def record(self, phase, start) -> int:
+        '''adds the time since start to phase, returns the current time'''
+        if not self._enabled:
+            return 0
+        now = time.perf_counter_ns()
+        self.add(phase, now - start)
+        return now
+
+    def add(self, phase, elapsed) -> None:
+        if not self._enabled:
+            return
+        samples = self._samples.get(phase)
+        if samples is None:
+            samples = self._samples[phase] = np.zeros(self._window, dtype=np.int64)
+            self._counts[phase] = 0
+            self._totals[phase] = 0
+        count = self._counts[phase]
+        samples[count % self._window] = elapsed
+        self._counts[phase] = count + 1
+        self._totals[phase] += elapsed
+        self._last[phase] = elapsed
+
+    def last(self, phase) -> int:
+        return self._last.get(phase, 0)
+
+    def count(self, phase) -> int:
+        '''number of durations recorded for phase'''
+        return self._counts.get(phase, 0)
+
+    def get_last(self) -> dict:
+        '''most recent duration per phase in ns'''
+        return dict(self._last)
+
+    def reset(self) -> None:
+        self._samples.clear()
+        self._counts.clear()
+        self._totals.clear()
+        self._last.clear()
+
+    def summary(self) -> dict:
+        '''
+        per phase: total count and ns, plus mean, percentiles and a log2
+        histogram (bucket i counts durations in [2^i, 2^(i+1)) ns) over the
+        rolling window
+        '''
+        profile = {}
+        for phase, samples in self._samples.items():
+            count = self._counts[phase]
+            window = samples[:min(count, self._window)]
+            buckets = np.minimum(np.log2(np.maximum(window, 1)).astype(np.int64), NUM_BUCKETS - 1)
+            p50, p90, p99 = np.percentile(window, (50, 90, 99))
+            profile[phase] = {
+                "count": count,
+                "total_ns": self._totals[phase],
+                "mean_ns": float(window.mean()),
+                "p50_ns": float(p50),
+                "p90_ns": float(p90),
+                "p99_ns": float(p99),
+                "max_ns": int(window.max()),
+                "histogram": np.bincount(buckets, minlength=NUM_BUCKETS),
+            }
+        return profile
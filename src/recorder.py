@@ -0,0 +1,259 @@
+import json
+import os
+import queue
+import threading
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+INDEX_FILE = "index.json"
+
+
+class TrajectoryRecorder:
+    '''
+    Appends environment steps to chunked columnar storage on disk: a directory
+    with one .npy file per column and chunk, or one Parquet row group per
+    chunk if path ends in .parquet (needs pyarrow). Rows are written into
+    preallocated chunk buffers, full chunks are handed to a background thread
+    for writing. At most max_pending chunks wait for the writer, after that
+    record() blocks, so memory stays bounded however long the run.
+
+    Every episode starts with a row flagged first that holds the reset
+    observation; every later row holds the action taken, the resulting
+    observation, reward and flags, and the (x, y, speed) state and validity
+    of the whole fleet.
+    '''
+    def __init__(self, path, obs_dim, num_actions, fleet_size, chunk_size=1024, max_pending=2):
+        self._path = path
+        self._chunk_size = chunk_size
+        self._spec = {
+            "episode": ((), np.int64),
+            "step": ((), np.int64),
+            "first": ((), np.bool_),
+            "obs": ((obs_dim,), np.float32),
+            "action": ((num_actions,), np.float32),
+            "reward": ((), np.float32),
+            "terminated": ((), np.bool_),
+            "truncated": ((), np.bool_),
+            "state": ((fleet_size, 3), np.float32),
+            "valid": ((fleet_size,), np.bool_),
+        }
+
+        self._writer = None
+        if path.endswith(".parquet"):
+            if pa is None:
+                raise ImportError("writing Parquet requires pyarrow")
+            self._writer = pq.ParquetWriter(path, self._schema())
+        else:
+            os.makedirs(path, exist_ok=True)
+
+        # one buffer is filled while the others wait for the writer
+        self._free = queue.Queue()
+        for _ in range(max_pending):
+            self._free.put(self._allocate())
+        self._pending = queue.Queue()
+        self._chunk = self._allocate()
+        self._rows = 0
+        self._chunk_rows = []
+        self._episode = -1
+        self._step = 0
+        self._error = None
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._write_chunks, daemon=True)
+        self._thread.start()
+
+    def _allocate(self) -> dict:
+        return {
+            name: np.zeros((self._chunk_size,) + shape, dtype=dtype)
+            for name, (shape, dtype) in self._spec.items()
+        }
+
+    def _schema(self):
+        fields = []
+        for name, (shape, dtype) in self._spec.items():
+            type = pa.from_numpy_dtype(dtype)
+            if shape:
+                type = pa.list_(type, int(np.prod(shape)))
+            fields.append((name, type))
+        columns = {name: {"shape": list(shape), "dtype": np.dtype(dtype).str}
+                   for name, (shape, dtype) in self._spec.items()}
+        return pa.schema(fields, metadata={"columns": json.dumps(columns)})
+
+    def start_episode(self, obs, state, valid) -> None:
+        self._episode += 1
+        self._step = 0
+        self._append(obs, None, 0.0, False, False, state, valid, first=True)
+
+    def record(self, obs, action, reward, terminated, truncated, state, valid) -> None:
+        if self._episode < 0:
+            raise RuntimeError("start_episode must be called before record")
+        self._step += 1
+        self._append(obs, action, reward, terminated, truncated, state, valid, first=False)
+
+    def _append(self, obs, action, reward, terminated, truncated, state, valid, first) -> None:
+        if self._error is not None:
+            raise RuntimeError("writing trajectory chunk failed") from self._error
+
+        chunk = self._chunk
+        i = self._rows
+        chunk["episode"][i] = self._episode
+        chunk["step"][i] = self._step
+        chunk["first"][i] = first
+        chunk["obs"][i] = obs
+        if action is None:
+            chunk["action"][i] = 0.0
+        else:
+            chunk["action"][i] = np.asarray(action, dtype=np.float32).reshape(-1)
+        chunk["reward"][i] = reward
+        chunk["terminated"][i] = terminated
+        chunk["truncated"][i] = truncated
+        chunk["state"][i] = state
+        chunk["valid"][i] = valid
+
+        self._rows += 1
+        if self._rows == self._chunk_size:
+            self._submit()
+
+    def _submit(self) -> None:
+        self._pending.put((len(self._chunk_rows), self._chunk, self._rows))
+        self._chunk_rows.append(self._rows)
+        # blocks while every other buffer is still waiting to be written
+        self._chunk = self._free.get()
+        self._rows = 0
+
+    def _write_chunks(self) -> None:
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+            index, chunk, rows = item
+            try:
+                self._write(index, chunk, rows)
+            except Exception as e:
+                self._error = e
+            self._free.put(chunk)
+
+    def _write(self, index, chunk, rows) -> None:
+        if self._writer is not None:
+            arrays = []
+            for name, (shape, _) in self._spec.items():
+                values = chunk[name][:rows]
+                if shape:
+                    values = pa.FixedSizeListArray.from_arrays(
+                        pa.array(values.reshape(-1)), int(np.prod(shape))
+                    )
+                arrays.append(values)
+            self._writer.write_table(pa.Table.from_arrays(arrays, schema=self._writer.schema))
+            return
+
+        for name in self._spec:
+            np.save(os.path.join(self._path, f"{name}_{index:05d}.npy"), chunk[name][:rows])
+
+    def flush(self) -> None:
+        '''hands the partially filled chunk to the writer'''
+        if self._rows:
+            self._submit()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self.flush()
+        self._pending.put(None)
+        self._thread.join()
+        if self._writer is not None:
+            self._writer.close()
+        else:
+            columns = {name: {"shape": list(shape), "dtype": np.dtype(dtype).str}
+                       for name, (shape, dtype) in self._spec.items()}
+            with open(os.path.join(self._path, INDEX_FILE), "w") as f:
+                json.dump({"chunks": self._chunk_rows, "columns": columns}, f)
+        if self._error is not None:
+            raise RuntimeError("writing trajectory chunk failed") from self._error
+
+
+def iter_chunks(path):
+    '''
+    yields one dict of column arrays per recorded chunk; .npy chunks are
+    memory-mapped, Parquet row groups are read one at a time
+    '''
+    if path.endswith(".parquet"):
+        if pa is None:
+            raise ImportError("reading Parquet requires pyarrow")
+        parquet = pq.ParquetFile(path)
+        columns = json.loads(parquet.schema_arrow.metadata[b"columns"])
+        for group in range(parquet.num_row_groups):
+            table = parquet.read_row_group(group)
+            chunk = {}
+            for name, column in columns.items():
+                values = table.column(name).combine_chunks()
+                if column["shape"]:
+                    values = values.flatten()
+                values = values.to_numpy(zero_copy_only=False).astype(column["dtype"], copy=False)
+                chunk[name] = values.reshape((table.num_rows,) + tuple(column["shape"]))
+            yield chunk
+        return
+
+    with open(os.path.join(path, INDEX_FILE)) as f:
+        index = json.load(f)
+    for i in range(len(index["chunks"])):
+        yield {
+            name: np.load(os.path.join(path, f"{name}_{i:05d}.npy"), mmap_mode="r")
+            for name in index["columns"]
+        }
+
+
+def export_transitions(path, out_dir) -> dict:
+    '''
+    converts a recording into (s, a, r, s2, d) arrays saved as s.npy, a.npy,
+    r.npy, s2.npy and d.npy in out_dir, returned memory-mapped. d is the
+    terminated flag only, truncated episodes still bootstrap. Works one chunk
+    at a time.
+    '''
+    count = 0
+    obs_dim = num_actions = None
+    for chunk in iter_chunks(path):
+        count += int(np.count_nonzero(~chunk["first"]))
+        obs_dim = chunk["obs"].shape[1]
+        num_actions = chunk["action"].shape[1]
+    if obs_dim is None:
+        raise ValueError(f"no recorded steps in {path}")
+
+    os.makedirs(out_dir, exist_ok=True)
+    shapes = {
+        "s": ((count, obs_dim), np.float32),
+        "a": ((count, num_actions), np.float32),
+        "r": ((count,), np.float32),
+        "s2": ((count, obs_dim), np.float32),
+        "d": ((count,), np.bool_),
+    }
+    out = {
+        name: np.lib.format.open_memmap(os.path.join(out_dir, f"{name}.npy"), mode="w+", shape=shape, dtype=dtype)
+        for name, (shape, dtype) in shapes.items()
+    }
+
+    # every non-first row closes a transition from the row before it, which
+    # may be the last row of the previous chunk
+    written = 0
+    previous = None
+    for chunk in iter_chunks(path):
+        obs = np.asarray(chunk["obs"])
+        steps = ~np.asarray(chunk["first"])
+        before = np.concatenate((obs[:1] if previous is None else previous[None], obs[:-1]))
+        n = int(np.count_nonzero(steps))
+        out["s"][written:written + n] = before[steps]
+        out["a"][written:written + n] = chunk["action"][steps]
+        out["r"][written:written + n] = chunk["reward"][steps]
+        out["s2"][written:written + n] = obs[steps]
+        out["d"][written:written + n] = chunk["terminated"][steps]
+        written += n
+        previous = obs[-1].copy()
+
+    for array in out.values():
+        array.flush()
+    return {name: np.load(os.path.join(out_dir, f"{name}.npy"), mmap_mode="r") for name in out}
@@ -0,0 +1,168 @@
+import hashlib
+import json
+import math
+import os
+import shutil
+import subprocess
+import tempfile
+import xml.etree.ElementTree as ET
+from sumolib import checkBinary
+import sumolib
+
+# bump when the generated files change for the same parameters
+SCENARIO_VERSION = 1
+CONFIG_FILE = "scenario.sumocfg"
+ROUTE_ID = "route_0"
+
+DEFAULT_VTYPES = {
+    "car": {"vClass": "passenger", "length": 5, "accel": 3.5, "decel": 2.2, "sigma": 1.0, "maxSpeed": 10},
+    "agent": {"vClass": "passenger", "length": 5, "accel": 3.5, "decel": 3, "sigma": 0, "maxSpeed": 10, "color": "red"},
+}
+
+
+class Scenario:
+    '''a built ring scenario: its SUMO configuration plus the fleet to drive on it'''
+    def __init__(self, config_file, key, num_vehicles, num_agents, route_id=ROUTE_ID):
+        self.config_file = config_file
+        self.key = key
+        self.num_vehicles = num_vehicles
+        self.num_agents = num_agents
+        self.route_id = route_id
+
+
+class ScenarioBuilder:
+    '''
+    Generates ring-road scenarios like demo_00: num_edges edges on a circle of
+    ring_length metres with num_lanes lanes each, vehicle types, a route
+    around the ring and optionally the rerouters that keep vehicles circling.
+    With traffic_lights every junction is signalised, with an induction loop
+    near the end of each incoming lane. With mesosim the configuration runs
+    SUMO's mesoscopic model, which Simulation picks up from it.
+    The network is compiled by netconvert. Every parameter set is built once
+    into <cache_dir>/<hash>/ and reused afterwards, also by other processes:
+    builds go to a temporary directory that is renamed into place.
+
+    The fleet size is not part of the files (Simulation inserts the vehicles
+    through TraCI), so scenarios differing only in their fleet share a build.
+    '''
+    def __init__(self, cache_dir):
+        self._cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def build(
+        self, num_vehicles, num_agents, ring_length=260.0, num_lanes=3, num_edges=8,
+        speed=13.89, vtypes=None, rerouters=True, step_length=1.0, traffic_lights=False,
+        mesosim=False
+    ) -> Scenario:
+        if num_edges < 3:
+            raise ValueError("a ring needs at least three edges")
+        params = {
+            "version": SCENARIO_VERSION,
+            "ring_length": float(ring_length),
+            "num_lanes": int(num_lanes),
+            "num_edges": int(num_edges),
+            "speed": float(speed),
+            "vtypes": vtypes if vtypes is not None else DEFAULT_VTYPES,
+            "rerouters": bool(rerouters),
+            "step_length": float(step_length),
+            "traffic_lights": bool(traffic_lights),
+        }
+        if mesosim:
+            # only set when on, micro builds keep their cache keys
+            params["mesosim"] = True
+        key = hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+        scenario_dir = os.path.join(self._cache_dir, key)
+
+        if not os.path.exists(os.path.join(scenario_dir, CONFIG_FILE)):
+            build_dir = tempfile.mkdtemp(prefix=f"{key}_", dir=self._cache_dir)
+            try:
+                self._write(build_dir, params)
+                os.rename(build_dir, scenario_dir)
+            except OSError:
+                # built concurrently by another worker
+                if not os.path.exists(os.path.join(scenario_dir, CONFIG_FILE)):
+                    raise
+            finally:
+                shutil.rmtree(build_dir, ignore_errors=True)
+
+        return Scenario(os.path.join(scenario_dir, CONFIG_FILE), key, num_vehicles, num_agents)
+
+    def _write(self, build_dir, params) -> None:
+        n = params["num_edges"]
+        edge_length = params["ring_length"] / n
+        radius = params["ring_length"] / (2 * math.pi)
+
+        def point(angle):
+            return f"{radius * math.cos(angle):.2f},{radius * math.sin(angle):.2f}"
+
+        nodes = ET.Element("nodes")
+        for i in range(n):
+            angle = 2 * math.pi * i / n
+            ET.SubElement(
+                nodes, "node", id=f"n{i}", x=f"{radius * math.cos(angle):.2f}",
+                y=f"{radius * math.sin(angle):.2f}",
+                type="traffic_light" if params["traffic_lights"] else "priority",
+            )
+
+        edges = ET.Element("edges")
+        for i in range(n):
+            # counter-clockwise arcs, the length is set so the ring is exact
+            start, end = 2 * math.pi * i / n, 2 * math.pi * (i + 1) / n
+            shape = " ".join(point(start + (end - start) * k / 8) for k in range(9))
+            ET.SubElement(
+                edges, "edge", id=f"e{i + 1}", attrib={"from": f"n{i}", "to": f"n{(i + 1) % n}"},
+                numLanes=str(params["num_lanes"]), speed=str(params["speed"]),
+                length=f"{edge_length:.2f}", shape=shape,
+            )
+
+        node_file = os.path.join(build_dir, "ring.nod.xml")
+        edge_file = os.path.join(build_dir, "ring.edg.xml")
+        net_file = os.path.join(build_dir, "ring.net.xml")
+        ET.ElementTree(nodes).write(node_file)
+        ET.ElementTree(edges).write(edge_file)
+        subprocess.run(
+            [
+                checkBinary("netconvert"), "--node-files", node_file, "--edge-files", edge_file,
+                "--output-file", net_file, "--no-turnarounds", "true",
+                # without internal lanes the ring length is the sum of the edges
+                "--no-internal-links", "true", "--no-warnings", "true",
+            ],
+            check=True, stdout=subprocess.DEVNULL,
+        )
+        # fails on a broken network before the build is published
+        sumolib.net.readNet(net_file)
+
+        routes = ET.Element("routes")
+        for vtype_id, attributes in params["vtypes"].items():
+            ET.SubElement(routes, "vType", id=vtype_id, attrib={k: str(v) for k, v in attributes.items()})
+        ET.SubElement(routes, "route", id=ROUTE_ID, edges=" ".join(f"e{i + 1}" for i in range(n)))
+        ET.ElementTree(routes).write(os.path.join(build_dir, "ring.rou.xml"))
+
+        additionals = ET.Element("additionals")
+        if params["rerouters"]:
+            # as in demo_00, vehicles on e1 head for e2 and on e2 for e1 again
+            for edge, destination in (("e1", "e2"), ("e2", "e1")):
+                rerouter = ET.SubElement(additionals, "rerouter", id=f"rerouter_{edge}", edges=edge, probability="1")
+                interval = ET.SubElement(rerouter, "interval", begin="0", end="10000")
+                ET.SubElement(interval, "destProbReroute", id=destination)
+        if params["traffic_lights"]:
+            for i in range(n):
+                for lane in range(params["num_lanes"]):
+                    ET.SubElement(
+                        additionals, "inductionLoop", id=f"loop_e{i + 1}_{lane}", lane=f"e{i + 1}_{lane}",
+                        pos=f"{max(edge_length - 5.0, 0.0):.2f}", period="60", file="NUL",
+                    )
+        ET.ElementTree(additionals).write(os.path.join(build_dir, "ring.add.xml"))
+
+        config = ET.Element("configuration")
+        inputs = ET.SubElement(config, "input")
+        ET.SubElement(inputs, "net-file", value="ring.net.xml")
+        ET.SubElement(inputs, "route-files", value="ring.rou.xml")
+        ET.SubElement(inputs, "additional-files", value="ring.add.xml")
+        time = ET.SubElement(config, "time")
+        ET.SubElement(time, "step-length", value=str(params["step_length"]))
+        if params.get("mesosim"):
+            mesoscopic = ET.SubElement(config, "mesoscopic")
+            ET.SubElement(mesoscopic, "mesosim", value="true")
+            ET.SubElement(mesoscopic, "meso-interpolate-pos", value="true")
+        ET.ElementTree(config).write(os.path.join(build_dir, CONFIG_FILE))
@@ -1,19 +1,236 @@
 import os
 import sys
+import itertools
 import optparse
+import shutil
+import tempfile
+import threading
+import xml.etree.ElementTree as ET
+import numpy as np
 import traci
 import traci._vehicletype
 import traci.constants as tc
 from sumolib import checkBinary
 from demo_00_listener import Listener_00
+from idm_ring import IDMRing, RingNetwork
+from lane_gaps import LaneGaps
+from observation import ObservationBuilder, NeighbourObservation
+from profiling import StepProfiler
 from typing import List
 from dotenv import load_dotenv
 
+try:
+    import libsumo
+except ImportError:
+    libsumo = None
+
 load_dotenv()
 
+BACKENDS = ("traci", "libsumo", "idm")
+VEHICLE_TYPE = "car"
+AGENT_TYPE = "agent"
+# traci.start is not thread-safe, simulations may be started by a pool thread
+_START_LOCK = threading.Lock()
+# numbers the labels given to simulations started without one
+_LABELS = itertools.count()
+# per traffic light: current phase and simulation time of the next switch
+TLS_VARS = (tc.TL_CURRENT_PHASE, tc.TL_NEXT_SWITCH)
+# per induction loop, aggregated over the loops on each light's lanes
+LOOP_VARS = (tc.LAST_STEP_VEHICLE_NUMBER, tc.LAST_STEP_OCCUPANCY, tc.LAST_STEP_MEAN_SPEED)
+# lowest speed cap set on a meso agent, a zero cap would park it for good
+MESO_MIN_SPEED = 0.1
+
+
+def simulation_config(
+    num_vehicles, num_agents, route_id, warmup_steps=None, action_repeat=1, num_neighbours=0,
+    context_radius=50.0, context_lanes=None, gap_features=False, config_file=None, mesosim=False
+) -> dict:
+    '''
+    the Simulation arguments that shape observations, actions and dynamics,
+    normalised so that two equally configured simulations compare equal
+    '''
+    return {
+        "num_vehicles": num_vehicles,
+        "num_agents": num_agents,
+        "route_id": route_id,
+        "warmup_steps": tuple(sorted(warmup_steps)) if warmup_steps else (0,),
+        "action_repeat": action_repeat,
+        "num_neighbours": num_neighbours,
+        "context_radius": context_radius,
+        "context_lanes": tuple(context_lanes) if context_lanes is not None else None,
+        "gap_features": gap_features,
+        "config_file": config_file,
+        "mesosim": mesosim,
+    }
+
+
+def _config_mesosim(config_file) -> bool:
+    '''whether the SUMO configuration switches the mesoscopic model on'''
+    element = ET.parse(config_file).getroot().find(".//mesosim")
+    return element is not None and element.get("value", "").lower() in ("true", "1", "on", "yes")
+
+
+def _subscription_columns(results, index, variables) -> tuple[np.ndarray, List[np.ndarray]]:
+    '''rows in index of the known objects in a subscription result dict and one array per variable'''
+    ids = [id for id in results if id in index]
+    rows = np.fromiter((index[id] for id in ids), dtype=np.int64, count=len(ids))
+    columns = [
+        np.fromiter((results[id][variable] for id in ids), dtype=float, count=len(ids))
+        for variable in variables
+    ]
+    return rows, columns
+
+
+class TrafficLights:
+    '''
+    State and control of all traffic lights in the network at once. Lights
+    and induction loops are subscribed, so one step delivers all of them and
+    the observation is assembled with array operations. Actions only cost a
+    round-trip for the lights they actually change, and for held phases that
+    would otherwise run out before the next action.
+
+    Observation row per light: one-hot current phase (padded to the longest
+    program), seconds until the next switch, vehicles counted by the loops on
+    its controlled lanes during the last step, their mean occupancy (%) and
+    the mean speed of the counted vehicles.
+    '''
+    def __init__(self, sumo, interval):
+        self._sumo = sumo
+        # seconds between two actions, a requested phase must last that long
+        self._interval = interval
+        self._ids = list(sumo.trafficlight.getIDList())
+        self._index = {id: i for i, id in enumerate(self._ids)}
+
+        phase_durations = []
+        lane_lights = {}
+        for i, id in enumerate(self._ids):
+            program = sumo.trafficlight.getProgram(id)
+            logics = sumo.trafficlight.getAllProgramLogics(id)
+            logic = next((l for l in logics if l.programID == program), logics[0])
+            phase_durations.append([phase.duration for phase in logic.phases])
+            for lane in sumo.trafficlight.getControlledLanes(id):
+                lane_lights[lane] = i
+        self._num_phases = np.array([len(d) for d in phase_durations], dtype=np.int64)
+        self._max_phases = int(self._num_phases.max())
+        self._phase_durations = np.zeros((len(self._ids), self._max_phases))
+        for i, durations in enumerate(phase_durations):
+            self._phase_durations[i, :len(durations)] = durations
+
+        # loops on lanes no light controls are ignored
+        self._loop_ids = []
+        loop_lights = []
+        for loop in sumo.inductionloop.getIDList():
+            light = lane_lights.get(sumo.inductionloop.getLaneID(loop))
+            if light is not None:
+                self._loop_ids.append(loop)
+                loop_lights.append(light)
+        self._loop_index = {id: i for i, id in enumerate(self._loop_ids)}
+        self._loop_lights = np.array(loop_lights, dtype=np.int64)
+        n = len(self._ids)
+        self._loops_per_light = np.maximum(np.bincount(self._loop_lights, minlength=n), 1)
+
+        self._phase = np.zeros(n, dtype=np.int64)
+        self._next_switch = np.zeros(n)
+        self._time = 0.0
+        self._loop_values = np.zeros((len(self._loop_ids), 3))
+        self._obs = np.zeros((n, self._max_phases + 4), dtype=np.float32)
+        self._rows = np.arange(n)
+
+        self.reset(sumo.simulation.getTime())
+
+    def reset(self, time) -> None:
+        '''(re)subscribes, e.g. after loadState, and reads the fresh values'''
+        # TraCI subscribes one object per call, the results come back in one dict
+        for id in self._ids:
+            self._sumo.trafficlight.subscribe(id, TLS_VARS)
+        for id in self._loop_ids:
+            self._sumo.inductionloop.subscribe(id, LOOP_VARS)
+        self.update(time)
+
+    def update(self, time) -> None:
+        rows, (phase, next_switch) = _subscription_columns(
+            self._sumo.trafficlight.getAllSubscriptionResults(), self._index, TLS_VARS
+        )
+        self._phase[rows] = phase
+        self._next_switch[rows] = next_switch
+        rows, columns = _subscription_columns(
+            self._sumo.inductionloop.getAllSubscriptionResults(), self._loop_index, LOOP_VARS
+        )
+        self._loop_values[rows] = np.column_stack(columns)
+        self._time = time
+        self._build(time)
+
+    def _build(self, time) -> None:
+        n = len(self._ids)
+        obs = self._obs
+        obs.fill(0.0)
+        obs[self._rows, self._phase] = 1.0
+        obs[:, self._max_phases] = self._next_switch - time
+
+        counts, occupancy, speed = self._loop_values.T
+        lights = self._loop_lights
+        vehicles = np.bincount(lights, weights=counts, minlength=n)
+        obs[:, self._max_phases + 1] = vehicles
+        obs[:, self._max_phases + 2] = np.bincount(lights, weights=occupancy, minlength=n) / self._loops_per_light
+        # SUMO reports -1 without vehicles, weighting by the count drops those
+        speed_sum = np.bincount(lights, weights=np.maximum(speed, 0.0) * counts, minlength=n)
+        obs[:, self._max_phases + 3] = speed_sum / np.maximum(vehicles, 1)
+
+    def set_phases(self, phases) -> None:
+        '''
+        switches every light whose phase differs from the requested one and
+        extends the phases that would end before the next action, so SUMO
+        does not advance a light on its own against the request
+        '''
+        phases = np.asarray(phases, dtype=np.int64).reshape(-1)
+        if phases.shape[0] != len(self._ids):
+            raise ValueError(f"expected {len(self._ids)} phases, got {phases.shape[0]}")
+        if np.any((phases < 0) | (phases >= self._num_phases)):
+            raise ValueError("phase index outside the light's program")
+        changed = phases != self._phase
+        for i in np.flatnonzero(changed):
+            self._sumo.trafficlight.setPhase(self._ids[i], int(phases[i]))
+
+        # a switched light starts its phase anew, a held one keeps what is left
+        remaining = np.where(changed, self._phase_durations[self._rows, phases], self._next_switch - self._time)
+        # one step of margin, SUMO switches at the end of the step the phase runs out in
+        short = remaining <= self._interval
+        for i in np.flatnonzero(short):
+            self._sumo.trafficlight.setPhaseDuration(self._ids[i], 2.0 * self._interval)
+        self._phase[:] = phases
+        self._next_switch[short] = self._time + 2.0 * self._interval
+
+    def set_durations(self, durations) -> None:
+        '''remaining duration of the current phase per light, NaN keeps it'''
+        durations = np.asarray(durations, dtype=float).reshape(-1)
+        if durations.shape[0] != len(self._ids):
+            raise ValueError(f"expected {len(self._ids)} durations, got {durations.shape[0]}")
+        for i in np.flatnonzero(~np.isnan(durations)):
+            self._sumo.trafficlight.setPhaseDuration(self._ids[i], float(durations[i]))
+
+    def get_observation(self) -> np.ndarray:
+        # (n_tls, obs_dim), overwritten in place by the next step
+        return self._obs
+
+    def get_ids(self) -> List[str]:
+        return self._ids
+
+    def get_num_phases(self) -> np.ndarray:
+        return self._num_phases
+
+
 class Simulation:
-    def __init__(self, num_vehicles, num_agents, route_id):
+    def __init__(
+        self, num_vehicles, num_agents, route_id, backend=None, warmup_steps=None,
+        label=None, action_repeat=1, profile=False, num_neighbours=0, context_radius=50.0,
+        context_lanes=None, gap_features=False, config_file=None, mesosim=False
+    ):
         self._N = num_vehicles + num_agents
+        # as constructed, before the configuration file is resolved
+        self._config = simulation_config(
+            num_vehicles, num_agents, route_id, warmup_steps, action_repeat, num_neighbours,
+            context_radius, context_lanes, gap_features, config_file, mesosim
+        )
         self._num_vehicles = num_vehicles
         self._num_agents = num_agents
         self._route_id = route_id
@@ -22,6 +239,43 @@ class Simulation:
         self._fleet_ids = None
         self._agent_ids = None
         self._vehicle_ids = None
+        self._backend = backend or os.getenv("SUMO_BACKEND", "traci")
+        self._sumo = traci
+        # labelled traci connections allow several simulations side by side
+        self._label = label
+        # SUMO steps per simulation_step, the commanded acceleration is held
+        self._action_repeat = action_repeat
+        self._delta_t = None
+        # one state snapshot is saved per warm-up step, reset restores one of them
+        self._warmup_steps = sorted(warmup_steps) if warmup_steps else [0]
+        self._snapshot_dir = None
+        self._snapshots = []
+        # SUMO output files by kind, read by the streaming readers in metrics
+        self._output_files = {}
+        # per-phase step timings, shared with the listener and the env
+        self._profiler = StepProfiler(enabled=profile)
+        # with num_neighbours > 0 each agent also observes its nearest
+        # vehicles through a context subscription of radius context_radius,
+        # optionally restricted to the lane offsets in context_lanes
+        self._num_neighbours = num_neighbours
+        self._context_radius = context_radius
+        self._context_lanes = context_lanes
+        self._neighbours = None
+        # leader/follower gaps of the whole fleet, computed after every step
+        self._gap_features = gap_features
+        self._gaps = None
+        self._traffic_lights = None
+        self._listener = None
+        # SUMO configuration, demo_00 unless e.g. built by ScenarioBuilder
+        self._config_file = config_file
+        # mesoscopic queue model instead of car following, also switched on
+        # by a configuration with mesosim set, e.g. ScenarioBuilder's
+        self._mesosim = mesosim
+
+        if self._backend not in BACKENDS:
+            sys.exit(f"unknown SUMO backend '{self._backend}', expected one of {BACKENDS}")
+        if self._mesosim and self._backend == "idm":
+            sys.exit("the idm backend has no mesoscopic mode")
     
     def setup_sumo(self) -> None:
         if 'SUMO_HOME' in os.environ:
@@ -31,7 +285,7 @@ class Simulation:
             print("SUMO_HOME path not set but continue...")
             # sys.exit("SUMO_HOME path not set correctly")
 
-    def get_options(self) -> None:
+    def get_options(self, args=None) -> None:
         opt_parser = optparse.OptionParser()
         opt_parser.add_option(
             "--nogui", 
@@ -39,40 +293,105 @@ class Simulation:
             default=False,
             help="run the commandline version of sumo"
         )
-        self._options, _ = opt_parser.parse_args()
+        opt_parser.add_option(
+            "--fcd",
+            action="store_true",
+            default=False,
+            help="also write floating car data to the output directory"
+        )
+        opt_parser.add_option(
+            "--seed",
+            type="int",
+            default=None,
+            help="random seed of the SUMO run"
+        )
+        # options are always explicit and never read from sys.argv; None runs
+        # headless, the GUI needs a list without --nogui, e.g. []
+        self._options, _ = opt_parser.parse_args(list(args) if args is not None else ["--nogui"])
         
     def start_sumo(self) -> None:
         root_path = os.getenv("SUMO_PROJECT_PATH")
-        config_file_path = os.path.join(root_path, "config/demo_00.sumocfg")
-        output_file_path = os.path.join(root_path, "output/tripinfo.xml")
-
-        if not os.path.exists(config_file_path):
-            sys.exit(f"config file not found at {config_file_path}")
-        if not os.path.exists(output_file_path):
-            sys.exit(f"output file not found at {output_file_path}")
-
+        config_file_path = self._config_file or os.path.join(root_path, "config/demo_00.sumocfg")
+        self._config_file = config_file_path
         if self._options.nogui:
             sumoBinary = checkBinary('sumo')
         else:
             sumoBinary = checkBinary('sumo-gui')
+
+        self._sumo = self._select_backend()
+        if self._label is None and self._sumo is traci and traci.connection.has("default"):
+            # another unlabelled simulation of this process is running, e.g.
+            # a second env, this one gets a connection of its own
+            self._label = f"{os.getpid()}_{next(_LABELS)}"
+
+        suffix = "" if self._label is None else f"_{self._label}"
+        output_file_path = os.path.join(root_path, "output", f"tripinfo{suffix}.xml")
+        if not os.path.exists(config_file_path):
+            sys.exit(f"config file not found at {config_file_path}")
+        if not os.path.isdir(os.path.dirname(output_file_path)):
+            sys.exit(f"output directory not found at {os.path.dirname(output_file_path)}")
         
         sumoCmd = [
             sumoBinary, 
             "-c", 
             config_file_path, 
             "--tripinfo-output", 
-            output_file_path
+            output_file_path,
+            # ring vehicles never arrive, unfinished trips are written on close
+            "--tripinfo-output.write-unfinished",
+            "true",
         ]
-        traci.start(sumoCmd)
+        if self._options.seed is not None:
+            sumoCmd += ["--seed", str(self._options.seed)]
+        self._mesosim = self._mesosim or _config_mesosim(config_file_path)
+        if self._mesosim:
+            if self._backend == "idm":
+                sys.exit("the idm backend has no mesoscopic mode")
+            # interpolated positions move vehicles along their segment every
+            # step instead of jumping from one segment start to the next
+            sumoCmd += ["--mesosim", "true", "--meso-interpolate-pos", "true"]
+        self._output_files = {"tripinfo": output_file_path}
+        if self._options.fcd:
+            fcd_file_path = os.path.join(root_path, "output", f"fcd{suffix}.xml")
+            sumoCmd += ["--fcd-output", fcd_file_path]
+            self._output_files["fcd"] = fcd_file_path
+        if self._label is None:
+            self._sumo.start(sumoCmd)
+        elif self._sumo is traci:
+            # labelled connections leave traci's default connection alone
+            with _START_LOCK:
+                traci.start(sumoCmd, label=self._label, doSwitch=False)
+            self._sumo = traci.getConnection(self._label)
+        else:
+            self._sumo.start(sumoCmd, label=self._label)
+
+    def _select_backend(self):
+        '''libsumo runs SUMO in-process but cannot drive sumo-gui'''
+        if self._backend == "idm":
+            # numpy IDM stand-in for ring networks, needs no SUMO install
+            return IDMRing()
+        if self._backend != "libsumo":
+            return traci
+        if not self._options.nogui:
+            print("libsumo does not support sumo-gui, falling back to traci...")
+            self._backend = "traci"
+            return traci
+        if libsumo is None:
+            print("libsumo not installed, falling back to traci...")
+            self._backend = "traci"
+            return traci
+        return libsumo
 
     def _vehicle_init(self) -> List[str]:
-        vehicleIDs = [None] * self._num_vehicles
+        vehicleIDs = [None] * self._N
         
-        for i in range(self._num_vehicles):
+        for i in range(self._N):
             vehicleIDs[i] = str(i)
         
-        for id in vehicleIDs:
-            traci.vehicle.add(id, self._route_id)
+        # background vehicles first, agents are queued behind them
+        for i, id in enumerate(vehicleIDs):
+            type_id = VEHICLE_TYPE if i < self._num_vehicles else AGENT_TYPE
+            self._sumo.vehicle.add(id, self._route_id, typeID=type_id)
         
         return vehicleIDs
 
@@ -82,40 +401,254 @@ class Simulation:
         self._vehicle_ids = [self._fleet_ids[i] for i in range(self._num_vehicles)]
         self._agent_ids = [self._fleet_ids[i] for i in range(self._num_vehicles, len(self._fleet_ids))]
 
-        # initialising listener 
-        self._listener = Listener_00(self._vehicle_ids, self._route_id)
-        traci.addStepListener(self._listener)
+        self._delta_t = self._sumo.simulation.getDeltaT()
+
+        # initialising listener, which fills the observation buffer in place
+        self._observation = ObservationBuilder(self._num_vehicles, self._num_agents)
+        if self._num_neighbours > 0 and self._num_agents > 0:
+            if self._mesosim:
+                sys.exit("context subscriptions are not available in mesoscopic mode")
+            self._neighbours = NeighbourObservation(
+                self._num_agents, self._num_neighbours, self._context_radius, self._context_lanes
+            )
+        # with neighbours, only the agents are subscribed unless the gaps
+        # need the whole fleet
+        self._listener = Listener_00(
+            self._fleet_ids, self._route_id, self._sumo, self._observation, self._profiler,
+            self._neighbours, self._mesosim, subscribe_fleet=self._gap_features
+        )
+        self._sumo.addStepListener(self._listener)
+
+        if self._gap_features:
+            network = RingNetwork(self._config_file)
+            lengths = [
+                network.vtypes[VEHICLE_TYPE if i < self._num_vehicles else AGENT_TYPE]["length"]
+                for i in range(self._N)
+            ]
+            # meso vehicles have no lane, the listener reports their edge
+            rings = [network.edge_ring(self._route_id)] if self._mesosim else network.lane_rings(self._route_id)
+            self._gaps = LaneGaps(rings, np.array(lengths))
+
+        # the idm stand-in has no traffic lights
+        if self._backend != "idm" and self._sumo.trafficlight.getIDList():
+            self._traffic_lights = TrafficLights(self._sumo, self._action_repeat * self._delta_t)
+
+        self._prev_context_distances = {}
+        self._prev_distances = np.zeros(self._num_vehicles)
+        self._prev_valid = np.zeros(self._num_vehicles, dtype=bool)
+
+        self._save_snapshots()
+        # warm-up steps are not part of the step profile
+        self._profiler.reset()
 
         # initalising DDPG agent --> responsibility of the environment
+
+    def _save_snapshots(self) -> None:
+        self._snapshot_dir = tempfile.mkdtemp(prefix="sumo_snapshots_")
+        self._snapshots = []
+
+        for warmup_step in self._warmup_steps:
+            while self._step < warmup_step:
+                self._advance(1)
+            state_file = os.path.join(self._snapshot_dir, f"state_{self._step}.xml")
+            self._sumo.simulation.saveState(state_file)
+            self._snapshots.append((state_file, self._step))
+
+    def simulation_reset(self, snapshot=0) -> None:
+        '''restores a saved state instead of relaunching SUMO'''
+        state_file, step = self._snapshots[snapshot]
+        self.load_state(state_file, step)
+
+    def load_state(self, state_file, step) -> None:
+        '''restores a state saved by save_state at the given step'''
+        self._sumo.simulation.loadState(state_file)
+        self._step = step
+        self._listener.reset()
+        if self._context_lanes is not None and self._neighbours is not None:
+            # SUMO applies a lane filter from the next step on, until then
+            # the contexts cover the plain radius; one step makes the first
+            # observation come from the same filtered contexts as the others
+            self._advance(1)
+        self._update_gaps()
+        if self._traffic_lights is not None:
+            self._traffic_lights.reset(self._step * self._delta_t)
+
+    def save_state(self, state_file) -> None:
+        self._sumo.simulation.saveState(state_file)
         
     def simulation_step(self) -> None:
-        self._step += 1
-        traci.simulation.step()
+        # odometers before the interval, to aggregate speeds over skipped steps
+        np.copyto(self._prev_distances, self._listener.getDistances()[:self._num_vehicles])
+        np.copyto(self._prev_valid, self._listener.getValid())
+        if self._neighbours is not None and self._action_repeat > 1:
+            self._prev_context_distances = dict(self._listener.getContextDistances())
+        self._advance(self._action_repeat)
+        self._update_gaps()
+        if self._traffic_lights is not None:
+            start = self._profiler.now()
+            self._traffic_lights.update(self._step * self._delta_t)
+            self._profiler.record("traffic_lights", start)
+
+    def _update_gaps(self) -> None:
+        if self._gaps is None:
+            return
+        start = self._profiler.now()
+        self._gaps.update(
+            self._listener.getLaneIDs(),
+            self._listener.getLanePosns(),
+            self._observation.get_fleet_speeds(),
+        )
+        self._profiler.record("gaps", start)
+
+    def _advance(self, steps) -> None:
+        start = self._profiler.now()
+        listener_count = self._profiler.count("listener")
+        self._step += steps
+        if steps == 1:
+            self._sumo.simulationStep()
+        else:
+            # one call runs SUMO up to the target time, listeners fire once
+            self._sumo.simulationStep(self._step * self._delta_t)
+        if self._profiler.enabled():
+            # the listener runs inside simulationStep and is timed on its own,
+            # if it ran during this call
+            elapsed = self._profiler.now() - start
+            if self._profiler.count("listener") > listener_count:
+                elapsed -= self._profiler.last("listener")
+            self._profiler.add("sumo_step", elapsed)
     
     def fast_forward(self) -> None:
-        while traci.simulation.getMinExpectedNumber() < self._num_vehicles:
-            traci.simulation.step()
+        while self._sumo.simulation.getMinExpectedNumber() < self._num_vehicles:
+            self._sumo.simulationStep()
             step += 1
         
     def end_simulation(self) -> None:
-        traci.close(False)
+        # libsumo keeps its step listeners across close and reopen
+        if self._listener is not None:
+            self._sumo.removeStepListener(self._listener.getID())
+            self._listener = None
+        if self._backend == "libsumo":
+            self._sumo.close()
+        else:
+            self._sumo.close(False)
         sys.stdout.flush()
 
+        if self._snapshot_dir is not None:
+            shutil.rmtree(self._snapshot_dir, ignore_errors=True)
+            self._snapshot_dir = None
+
     def get_step(self) -> int:
         return self._step
     
     def get_ids(self) -> tuple[List[int], List[int]]:
         return self._vehicle_ids, self._agent_ids
     
+    def get_num_snapshots(self) -> int:
+        return len(self._snapshots)
+
+    def get_config(self) -> dict:
+        '''construction arguments, see simulation_config'''
+        return self._config
+
+    def get_config_file(self) -> str:
+        return self._config_file
+
+    def get_output_files(self) -> dict:
+        return self._output_files
+
+    def get_profiler(self) -> StepProfiler:
+        return self._profiler
+
+    def get_backend(self) -> str:
+        return self._backend
+
     def get_terminated(self) -> bool:
-        return not traci.simulation.getMinExpectedNumber() > 0
+        return not self._sumo.simulation.getMinExpectedNumber() > 0
     
-    def get_obs(self) -> tuple[List[float], List[float]]:
+    def get_observation(self) -> ObservationBuilder:
+        return self._observation
+
+    def get_neighbours(self) -> NeighbourObservation:
+        '''None unless the simulation was created with num_neighbours > 0'''
+        return self._neighbours
+
+    def get_mesosim(self) -> bool:
+        return self._mesosim
+
+    def get_traffic_lights(self) -> TrafficLights:
+        '''None if the network has no traffic lights'''
+        return self._traffic_lights
+
+    def get_gaps(self) -> np.ndarray:
+        '''
+        (N, 4) leader gap, leader speed difference, follower gap and follower
+        speed difference for vehicles then agents, None unless gap_features
+        '''
+        return None if self._gaps is None else self._gaps.get_features()
+
+    def get_interval_speed(self) -> float:
+        '''
+        mean vehicle speed summed over the SUMO steps of the last
+        simulation_step, from the distance each vehicle drove in between
+        '''
+        valid = self._listener.getValid() & self._prev_valid
+        count = np.count_nonzero(valid)
+        if count == 0:
+            return 0.0
+        distances = self._listener.getDistances()[:self._num_vehicles]
+        driven = (distances - self._prev_distances)[valid].sum()
+        return float(driven / (count * self._delta_t))
+
+    def get_context_speed(self) -> float:
+        '''
+        mean speed of the vehicles around the agents, from the context
+        subscriptions; with action_repeat > 1 summed over the SUMO steps of
+        the last simulation_step like get_interval_speed, from the distance
+        each vehicle in the context before and after drove in between. 0.0
+        without neighbours
+        '''
+        if self._action_repeat == 1:
+            return self._listener.getContextSpeed()
+        distances = self._listener.getContextDistances()
+        driven = [distances[id] - before for id, before in self._prev_context_distances.items() if id in distances]
+        if not driven:
+            return 0.0
+        return float(sum(driven) / (len(driven) * self._delta_t))
+
+    def get_obs(self) -> tuple[np.ndarray, np.ndarray]:
+        # views onto the listener's buffers, refreshed in place every step
         speeds = self._listener.getSpeeds()
         posns = self._listener.getPosns()
         return speeds, posns
         
-    def set_acceleration(self, action: List[float]) -> None:
-        '''todo: add error handling'''
-        for id in self._agent_ids:
-            traci.vehicle.setAcceleration(id, action[int(id)])
+    def set_acceleration(self, action: np.ndarray) -> None:
+        '''
+        applies one acceleration per agent, given as (num_agents,) or
+        (num_agents, 1), and holds it for the whole control interval
+        '''
+        if not self._agent_ids:
+            return
+        start = self._profiler.now()
+        action = np.asarray(action, dtype=float).reshape(-1)
+        if action.shape[0] != self._num_agents:
+            raise ValueError(f"expected {self._num_agents} accelerations, got {action.shape[0]}")
+
+        duration = self._action_repeat * self._delta_t
+        if self._mesosim:
+            self._set_target_speeds(action, duration)
+        else:
+            for id, acceleration in zip(self._agent_ids, action.tolist()):
+                self._sumo.vehicle.setAcceleration(id, acceleration, duration)
+        self._profiler.record("set_acceleration", start)
+
+    def _set_target_speeds(self, action, duration) -> None:
+        '''
+        meso has no setAcceleration or setSpeed, the acceleration held over
+        the interval becomes a cap on the agent's speed instead; SUMO applies
+        it to the segments the agent enters from then on
+        '''
+        agents = self._observation.get_agent_rows()
+        valid = self._observation.get_agent_valid()
+        targets = np.maximum(agents[:, 2] + action * duration, MESO_MIN_SPEED)
+        for i in np.flatnonzero(valid):
+            self._sumo.vehicle.setMaxSpeed(self._agent_ids[i], float(targets[i]))
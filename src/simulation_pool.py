@@ -0,0 +1,96 @@
+import itertools
+import os
+import queue
+import threading
+from src.simulation import Simulation
+
+_STOP = object()
+
+
+class SimulationPool:
+    '''
+    Keeps `size` simulations started, initialised and warmed up on labelled
+    connections, so taking one does not wait for SUMO start-up, network
+    loading and the warm-up snapshots. A background thread starts a
+    replacement for every simulation handed out.
+
+    Every pooled simulation runs in its own SUMO process, so the backend is
+    traci (or the idm stand-in); libsumo allows a single instance per process.
+    The simulation keyword arguments are the ones of Simulation, sumo_args
+    are the SUMO options passed to get_options.
+    '''
+    def __init__(self, size, num_vehicles, num_agents, route_id, sumo_args=("--nogui",), **kwargs):
+        backend = kwargs.pop("backend", None) or os.getenv("SUMO_BACKEND", "traci")
+        if backend == "libsumo":
+            # libsumo runs one simulation per process, pooling needs traci
+            backend = "traci"
+        if size < 1:
+            raise ValueError("pool size must be at least 1")
+
+        self._size = size
+        self._num_vehicles = num_vehicles
+        self._num_agents = num_agents
+        self._route_id = route_id
+        self._backend = backend
+        self._sumo_args = list(sumo_args)
+        self._kwargs = kwargs
+        self._labels = itertools.count()
+
+        self._ready = queue.Queue()
+        self._requests = queue.Queue()
+        self._closed = threading.Event()
+        for _ in range(size):
+            self._requests.put(None)
+        self._thread = threading.Thread(target=self._fill, daemon=True)
+        self._thread.start()
+
+    def _create(self) -> Simulation:
+        simulation = Simulation(
+            self._num_vehicles, self._num_agents, self._route_id, backend=self._backend,
+            label=f"pool_{os.getpid()}_{next(self._labels)}", **self._kwargs
+        )
+        simulation.setup_sumo()
+        simulation.get_options(self._sumo_args)
+        simulation.start_sumo()
+        simulation.simulation_init()
+        return simulation
+
+    def _fill(self) -> None:
+        while True:
+            if self._requests.get() is _STOP or self._closed.is_set():
+                return
+            try:
+                self._ready.put(self._create())
+            except (Exception, SystemExit) as e:
+                # raised again in the thread that acquires it
+                self._ready.put(e)
+
+    def acquire(self, timeout=None) -> Simulation:
+        '''
+        a ready simulation, blocking until one is available; the caller owns
+        it and ends it with release() or end_simulation()
+        '''
+        simulation = self._ready.get(timeout=timeout)
+        self._requests.put(None)
+        if isinstance(simulation, BaseException):
+            raise RuntimeError("starting a pooled simulation failed") from simulation
+        return simulation
+
+    def release(self, simulation: Simulation) -> None:
+        simulation.end_simulation()
+
+    def get_size(self) -> int:
+        return self._size
+
+    def close(self) -> None:
+        '''stops refilling and ends the simulations still waiting in the pool'''
+        self._closed.set()
+        self._requests.put(_STOP)
+        self._thread.join()
+        while True:
+            try:
+                simulation = self._ready.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(simulation, Simulation):
+                simulation.end_simulation()
@@ -0,0 +1,150 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import xml.etree.ElementTree as ET
+import numpy as np
+from src.simulation import Simulation
+
+INDEX_FILE = "index.json"
+# configuration entries whose files take part in the key
+INPUT_FILES = ("net-file", "route-files", "additional-files")
+
+
+def config_key(config_file, route_id, num_vehicles, num_agents, backend, mesosim=False) -> str:
+    '''
+    hash of the SUMO configuration with its input files and the fleet that
+    states are saved for; traci and libsumo share the state format, micro
+    and meso states do not
+    '''
+    digest = hashlib.sha256()
+    config_dir = os.path.dirname(os.path.abspath(config_file))
+    with open(config_file, "rb") as f:
+        digest.update(f.read())
+
+    config = ET.parse(config_file).getroot()
+    for tag in INPUT_FILES:
+        element = config.find(f".//{tag}")
+        if element is None:
+            continue
+        for file_name in element.get("value").split(","):
+            with open(os.path.join(config_dir, file_name.strip()), "rb") as f:
+                digest.update(f.read())
+
+    fleet = {
+        "route_id": route_id,
+        "num_vehicles": num_vehicles,
+        "num_agents": num_agents,
+        "format": "idm" if backend == "idm" else "sumo",
+    }
+    if mesosim:
+        fleet["mesosim"] = True
+    digest.update(json.dumps(fleet, sort_keys=True).encode())
+    return digest.hexdigest()[:16]
+
+
+class StateBank:
+    '''
+    Saved simulation states for one configuration key, read from
+    <bank_dir>/<key>/index.json. Each entry holds the state file, the step it
+    was saved at and the seed, number of vehicles in the network and mean
+    speed it was generated with.
+    '''
+    def __init__(self, bank_dir, key):
+        self._dir = os.path.join(bank_dir, key)
+        index_file = os.path.join(self._dir, INDEX_FILE)
+        if not os.path.exists(index_file):
+            raise FileNotFoundError(f"no states for configuration {key} in {bank_dir}")
+        with open(index_file) as f:
+            self._entries = json.load(f)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, index) -> tuple[str, int]:
+        '''state file and step of entry index'''
+        entry = self._entries[index]
+        return os.path.join(self._dir, entry["file"]), entry["step"]
+
+    def sample(self, rng: np.random.Generator) -> tuple[str, int]:
+        return self.get(int(rng.integers(len(self._entries))))
+
+    def get_entries(self) -> list:
+        return self._entries
+
+
+def _simulate_states(job) -> list:
+    '''worker: one seeded run saving a state at each of the given steps'''
+    bank_dir, key, num_vehicles, num_agents, route_id, backend, seed, steps, config_file, mesosim = job
+    state_dir = os.path.join(bank_dir, key)
+    simulation = Simulation(
+        num_vehicles, num_agents, route_id, backend, label=f"bank_{key}_{seed}", profile=False,
+        config_file=config_file, mesosim=mesosim
+    )
+    simulation.setup_sumo()
+    simulation.get_options(["--nogui", "--seed", str(seed)])
+    simulation.start_sumo()
+    simulation.simulation_init()
+
+    # random agent accelerations spread the states further apart
+    rng = np.random.default_rng(seed)
+    entries = []
+    for step in sorted(steps):
+        while simulation.get_step() < step:
+            if num_agents:
+                simulation.set_acceleration(rng.uniform(-3.0, 1.0, num_agents))
+            simulation.simulation_step()
+        file_name = f"state_{seed}_{step}.xml"
+        simulation.save_state(os.path.join(state_dir, file_name))
+        observation = simulation.get_observation()
+        entries.append({
+            "file": file_name,
+            "step": simulation.get_step(),
+            "seed": seed,
+            "num_running": int(np.count_nonzero(observation.get_fleet_valid())),
+            "mean_speed": observation.mean_speed(),
+        })
+    simulation.end_simulation()
+    return entries
+
+
+def generate_state_bank(
+    bank_dir, num_vehicles, num_agents, route_id, steps, seeds, backend=None, workers=None,
+    config_file=None, mesosim=False
+) -> list:
+    '''
+    simulates every (fleet size, seed) pair in a separate worker process and
+    saves a state at each step, adding the states to the bank of each fleet
+    size; several fleet sizes give several densities. Returns the keys.
+    '''
+    backend = backend or os.getenv("SUMO_BACKEND", "traci")
+    config_file = config_file or os.path.join(os.getenv("SUMO_PROJECT_PATH"), "config/demo_00.sumocfg")
+    sizes = [num_vehicles] if np.isscalar(num_vehicles) else list(num_vehicles)
+
+    jobs = []
+    keys = {}
+    for size in sizes:
+        key = config_key(config_file, route_id, size, num_agents, backend, mesosim)
+        keys[size] = key
+        os.makedirs(os.path.join(bank_dir, key), exist_ok=True)
+        for seed in seeds:
+            jobs.append((bank_dir, key, size, num_agents, route_id, backend, seed, list(steps), config_file, mesosim))
+
+    # spawned workers, every one runs its own SUMO (or libsumo) instance
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(workers or min(len(jobs), os.cpu_count())) as pool:
+        results = pool.map(_simulate_states, jobs)
+
+    for size, key in keys.items():
+        index_file = os.path.join(bank_dir, key, INDEX_FILE)
+        entries = {}
+        if os.path.exists(index_file):
+            with open(index_file) as f:
+                entries = {entry["file"]: entry for entry in json.load(f)}
+        for job, job_entries in zip(jobs, results):
+            if job[1] == key:
+                entries.update((entry["file"], entry) for entry in job_entries)
+        with open(index_file + ".tmp", "w") as f:
+            json.dump(sorted(entries.values(), key=lambda e: (e["seed"], e["step"])), f, indent=1)
+        os.replace(index_file + ".tmp", index_file)
+    return [keys[size] for size in sizes]